@@ -1 +1,23 @@
-__import__('pkg_resources').declare_namespace(__name__)
\ No newline at end of file
+"""
+Sullivan forms, Dupont forms and the Dupont contraction, on simplices
+(dupontcontraction.simplicial) and on cubes (dupontcontraction.cubical).
+
+The subpackages are imported on first access, so that importing the package
+does not load both implementations.
+"""
+
+import importlib
+
+_SUBPACKAGES = ('simplicial', 'cubical')
+
+__all__ = list(_SUBPACKAGES)
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBPACKAGES))
@@ -21,31 +21,78 @@ For the signs, one can find that if (-1)^e(t) is the sign of the tree t and
 t = c2 o (t1, t2), then e(t) = n1 + 1 + e(t1) + e(t2) modulo 2.
 """
 
-import itertools as it
+# trees without shift for each arity, as nested tuples (filled bottom-up)
+_base_trees = {}
 
-def binary_tree_generator(arity, shift=0):
+
+def _shift_leaves(tree, shift):
+    """
+    Add shift to the leaves of a tree given by nested tuples.
+    """
+    if isinstance(tree, int):
+        return tree + shift
+    return tuple(_shift_leaves(t, shift) for t in tree)
+
+
+def _to_lists(tree, shift=0):
+    """
+    Nested lists for a tree given by nested tuples, adding shift to leaves.
+    """
+    if isinstance(tree, int):
+        return tree + shift
+    return [_to_lists(t, shift) for t in tree]
+
+
+def _trees_of_arity(arity):
+    """
+    All couples (sign, tree, arities) for trees of the given arity with leaves
+    0, ..., arity - 1, as nested tuples. The trees of all smaller arities are
+    computed once and reused.
+    """
+    for a in range(1, arity + 1):
+        if a in _base_trees:
+            continue
+        
+        if a == 1:
+            _base_trees[a] = ((1, 0, (1,)),)
+        elif a == 2:
+            _base_trees[a] = ((1, (0, 1), (2, (1,), (1,))),)
+        else:
+            trees = []
+            for n1 in range(1, a):
+                n2 = a - n1
+                for s1, t1, a1 in _base_trees[n1]:
+                    for s2, t2, a2 in _base_trees[n2]:
+                        trees.append((
+                            s1*s2*(-1)**n1,
+                            (t1, _shift_leaves(t2, n1)),
+                            (a, a1, a2)
+                        ))
+            _base_trees[a] = tuple(trees)
     
+    return _base_trees[arity]
+
+
+def binary_tree_list(arity):
+    """
+    Same couples (sign, tree, arities) as binary_tree_generator(arity), with
+    the trees and arities as nested tuples instead of lists. The tuple is
+    built once per arity and shared, so that sums over all trees of an arity
+    can loop over it directly.
+    """
     if not isinstance(arity, int):
         raise TypeError('Invalid arity')
     if arity < 1:
         raise ValueError('Invalid arity')
-        
-    if arity == 1:
-        yield (1, 0 + shift, [1])
-        return
     
-    if arity == 2:
-        yield (1, [0 + shift, 1 + shift], [2, [1], [1]])
-        return
+    return _trees_of_arity(arity)
+
+
+def binary_tree_generator(arity, shift=0):
     
-    if arity > 2:
-        for n1 in range(1, arity):
-            n2 = arity - n1
-            for (s1, t1, a1), (s2, t2, a2) in it.product(
-                    binary_tree_generator(n1, shift=shift),
-                    binary_tree_generator(n2, shift=n1 + shift)
-                    ):
-                yield (s1*s2*(-1)**n1, [t1, t2], [arity, a1, a2])
+    # fresh lists at each call, the stored trees are never exposed
+    for s, t, a in binary_tree_list(arity):
+        yield (s, _to_lists(t, shift), _to_lists(a))
 
 
 def map_args(tree, args):
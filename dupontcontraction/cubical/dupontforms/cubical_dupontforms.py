@@ -2,27 +2,210 @@
 Class for cubical Dupont forms.
 """
 
-import sys
-import os
-import fractions
-from copy import deepcopy
-import numpy as np
-
-sys.path.append(
-    os.path.dirname(
-        os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__))
-        )
+from functools import lru_cache
+from types import MappingProxyType
+
+from ..signed_ordered_set import sort_and_sign
+from ...rationals import to_Q
+from ..sullivanforms import cubical_sullivanforms as csf
+from ..sullivanforms import cubical_auxiliary_functions as caf
+from ..sullivanforms.cubical_auxiliary_functions import _popcount
+from . import binary_tree_generator as btg
+
+
+def _encode_key(I, J):
+    """
+    Encode a basic form as a couple of integers (I_mask, J_mask).
+    
+    Bit i - 1 of I_mask is set iff i is in I, and bit k of J_mask is the k-th
+    element of J (i.e. the image of the k-th coordinate not in I).
+    """
+    I_mask = 0
+    for i in I:
+        I_mask |= 1 << (i - 1)
+    J_mask = 0
+    for k, j in enumerate(J):
+        J_mask |= int(j) << k
+    return (I_mask, J_mask)
+
+
+@lru_cache(maxsize=8192)
+def _parse_key(n, k):
+    """
+    Parse a string key 'i_1|...|i_k,j_1...j_{n-k}' into the encoded key and
+    the sign of the permutation ordering I. Keys are drawn from a finite basis,
+    so the result is cached.
+    """
+    I, J = k.split(',')
+    
+    if I != '':
+        I = tuple(map(int, I.split('|')))
+    else:
+        I = ()
+        
+    for i in I:
+        if i <= 0 or i > n or not isinstance(i, int):
+            raise TypeError('Invalid form')
+    I, sign = sort_and_sign(I)
+    degree = len(I)
+    
+    if len(J) != n - degree:
+        raise TypeError('Invalid form')
+    
+    for j in J:
+        if j not in '01':
+            raise TypeError('Invalid form')
+    
+    return _encode_key(I, J), sign
+
+
+@lru_cache(maxsize=8192)
+def _decode_key(n, key):
+    """
+    Decode a key (I_mask, J_mask) into the tuples I (ordered) and J.
+    """
+    I_mask, J_mask = key
+    I = tuple(i for i in range(1, n + 1) if (I_mask >> (i - 1)) & 1)
+    J = tuple((J_mask >> k) & 1 for k in range(n - _popcount(I_mask)))
+    return I, J
+
+
+@lru_cache(maxsize=8192)
+def _key_to_str(n, key):
+    """
+    String representation 'i_1|...|i_k,j_1...j_{n-k}' of a key.
+    """
+    I, J = _decode_key(n, key)
+    return f"{'|'.join([str(i) for i in I])},{''.join([str(j) for j in J])}"
+
+
+@lru_cache(maxsize=8192)
+def _d_basis(n, key):
+    """
+    Differential of the basic form with encoded key (I_mask, J_mask). Works
+    on integers only and returns a tuple of couples (key, sign).
+    """
+    I_mask, J_mask = key
+    out = []
+    
+    # iterate over the coordinates not in I (lowest bit first)
+    comp = ((1 << n) - 1) ^ I_mask
+    cnt = 0
+    while comp:
+        low = comp & -comp
+        i = low.bit_length()
+        j = (J_mask >> cnt) & 1
+        
+        # d(1 - x_i) = -dx_i and d(x_i) = dx_i, and i - 1 - cnt is the number
+        # of elements of I smaller than i that dx_i moves past. The sign is
+        # read off the parity bit instead of computing a power of -1
+        sign = 1 - ((((1 - j) + (i - 1 - cnt)) & 1) << 1)
+        out_I = I_mask | low
+        out_J = (J_mask & ((1 << cnt) - 1)) | ((J_mask >> (cnt + 1)) << cnt)
+        out.append(((out_I, out_J), sign))
+        
+        comp ^= low
+        cnt += 1
+    
+    return tuple(out)
+
+
+@lru_cache(maxsize=8192)
+def _basis_i(n, key):
+    """
+    Image under i of the basic form with encoded key (I_mask, J_mask) in
+    dimension n. Only depends on (n, key), hence cached (and shared).
+    """
+    I, _ = _decode_key(n, key)
+    I_mask, J_mask = key
+    dx = csf.SullivanForm._from_canonical(
+        n,
+        {I: {caf._zero_monomial(n): to_Q(1)}}
     )
-)
+    
+    cnt = 0
+    for i in range(1, n + 1):
+        if not (I_mask >> (i - 1)) & 1:
+            j = (J_mask >> cnt) & 1
+            cnt += 1
+            
+            if j == 0:
+                dx *= csf.SullivanForm(n, f"1 - x_{i}")
+            else:
+                dx *= csf.SullivanForm(n, f"x_{i}")
+    
+    return dx
 
-from cubical.signed_ordered_set import SignedOrderedSet
-import cubical.sullivanforms.cubical_sullivanforms as csf
-import cubical.dupontforms.binary_tree_generator as btg
+
+def _balanced_product(forms, positive_degree=False):
+    """
+    Product of a list of (Sullivan) forms, computed by recursive halving so
+    that the two factors of every multiplication have comparable size. With
+    positive_degree, the degree 0 part of the result may be left out (used
+    before applying h, which vanishes on it).
+    """
+    if len(forms) == 1:
+        return forms[0]
+    mid = len(forms) // 2
+    left = _balanced_product(forms[:mid])
+    right = _balanced_product(forms[mid:])
+    if left.is_zero or right.is_zero:
+        return csf.SullivanForm.zero(left.n)
+    return csf._mul_cached(left, right, positive_degree)
+
+
+@lru_cache(maxsize=None)
+def _binary_trees(arity):
+    """
+    Couples (sign, tree) of all binary trees of given arity, as produced by
+    binary_tree_list. The leaves of the trees are the indices 0,...,arity-1
+    of the arguments. Only depends on the arity, hence cached.
+    """
+    return tuple(
+        (sign, tree) for sign, tree, _ in btg.binary_tree_list(arity)
+    )
+
+
+def _map_leaves(tree, args):
+    """
+    Replace the indices at the leaves of tree by the corresponding arguments.
+    """
+    if isinstance(tree, int):
+        return args[tree]
+    return [_map_leaves(sub_tree, args) for sub_tree in tree]
+
+
+def _degree_lower_bound(tree, n):
+    """
+    Lower bound for the form degree of the product of the Sullivan forms at
+    the top vertex of tree, i.e. before applying h or p. Returns None if the
+    product at some vertex of tree vanishes for degree reasons (degree higher
+    than n) or if one of the leaves is zero. Works on the keys only, no Sullivan
+    form is computed.
+    """
+    deg = 0
+    for sub_tree in tree:
+        if isinstance(sub_tree, DupontForm):
+            if sub_tree.is_zero:
+                return None
+            deg += min(_popcount(I_mask) for I_mask, _ in sub_tree.form)
+        else:
+            sub_deg = _degree_lower_bound(sub_tree, n)
+            if sub_deg is None:
+                return None
+            # h lowers the degree by one
+            deg += sub_deg - 1
+    
+    if deg > n:
+        return None
+    return deg
 
 
 class DupontForm:
     
+    # no instance dict; _i_cache and _hash are computed on first use
+    __slots__ = ('n', 'is_zero', 'form', '_i_cache', '_hash')
+    
     def __init__(self, n, form):
         """
         
@@ -39,87 +222,106 @@ class DupontForm:
                 of I (ordered). For example, for n=4 the key '2|4,01' denotes
                 I={2,4}, J(1) = 0, J(3) = 1. The associated element is the
                 coefficient of that form (a rational number).
+                Keys can also be given already encoded as couples of integers
+                (I_mask, J_mask), which is how they are stored in self.form:
+                bit i - 1 of I_mask is set iff i is in I and bit k of J_mask
+                is the k-th element of J.
+                self.form is a read-only mapping (types.MappingProxyType):
+                forms cannot be modified once built.
         """
         
         if not isinstance(n, int):
             raise TypeError('n is not an integer')
-        if not (isinstance(form, dict) or isinstance(form, str)):
-            raise TypeError('invalid form')
         
         self.n = n
+        # image under i, computed on first use (see _i_cached)
+        self._i_cache = None
+        self._hash = None
         
         if form == '0':
             self.is_zero = True
-            self.form = dict()
+            self.form = MappingProxyType({})
             return
         
-        self.is_zero = False
+        # from here on only dicts are accepted
+        if not isinstance(form, dict):
+            if isinstance(form, str):
+                raise NotImplementedError('string argument for form is not '
+                                          'implemented yet')
+            raise TypeError('invalid form')
         
-        if isinstance(form, str):
-            raise NotImplementedError('string argument for form is not '
-                                      'implemented yet')
+        self.is_zero = False
         
-        if isinstance(form, dict):
-            out_form = dict()
-            for k, c in form.items():
-                I, J = k.split(',')
-                
-                if I != '':
-                    I = [int(i) for i in I.split('|')]
-                else:
-                    I = []
-                    
-                for i in I:
-                    if i <= 0 or i > n or not isinstance(i, int):
-                        raise TypeError('Invalid form')
-                I = SignedOrderedSet(I)
-                
-                sign = I.sign()
-                degree = len(I)
-                
-                if len(J) != n - degree:
+        out_form = dict()
+        for k, c in form.items():
+            if isinstance(k, tuple):
+                # already encoded key
+                I_mask, J_mask = k
+                degree = _popcount(I_mask)
+                if I_mask >> n or J_mask >> (n - degree):
                     raise TypeError('Invalid form')
-                
-                for j in J:
-                    if j not in '01':
-                        raise TypeError('Invalid form')
-                        
-                key = f"{str(I)},{J}"
-                coeff = sign*fractions.Fraction(c)
-                
-                if key in out_form:
-                    out_form[key] = coeff + out_form[key]
-                else:
-                    out_form[key] = coeff
-                
-                if out_form[key] == 0:
-                    del out_form[key]
+                key = (I_mask, J_mask)
+                sign = 1
+            else:
+                key, sign = _parse_key(n, k)
+            
+            coeff = sign*to_Q(c)
             
-            self.form = out_form
+            if key in out_form:
+                out_form[key] = coeff + out_form[key]
+            else:
+                out_form[key] = coeff
             
-            # check for zero forms
-            if not out_form:
-                self.is_zero = True
+            if out_form[key] == 0:
+                del out_form[key]
+        
+        self.form = MappingProxyType(out_form)
+        
+        # check for zero forms
+        if not out_form:
+            self.is_zero = True
         
         
     def __eq__(self, other):
         """
         Check equality of Dupont forms by comparing coefficients on the basis.
-        """        
-        for w, c in self.form.items():
-            if w not in other.form or c != other.form[w]:
-                return False
-        for w, c in other.form.items():
-            if w not in self.form or c != self.form[w]:
-                return False
-        return True
+        Zero coefficients are never stored, so this is a comparison of dicts.
+        """
+        return (
+            isinstance(other, DupontForm)
+            and self.n == other.n
+            and self.form == other.form
+        )
+    
     
+    def __hash__(self):
+        # the content is read-only, so the hash is computed once
+        if self._hash is None:
+            self._hash = hash((self.n, frozenset(self.form.items())))
+        return self._hash
     
+    
+    @staticmethod
     def zero(n):
         """
         Zero Dupont form of simplicial degree n.
         """
         return DupontForm(n, '0')
+    
+    
+    @staticmethod
+    def _from_canonical(n, form):
+        """
+        Wrap a dict of encoded keys with non-zero coefficients into a Dupont
+        form without going through the validation of __init__.
+        """
+        out = DupontForm.__new__(DupontForm)
+        out.n = n
+        out.form = MappingProxyType(form)
+        out.is_zero = not form
+        out._i_cache = None
+        out._hash = None
+        return out
         
     
     def __repr__(self):
@@ -135,30 +337,33 @@ class DupontForm:
         if self.is_zero:
             return '0'
         
-        r = ''
+        parts = []
         for i, (k, c) in enumerate(self.form.items()):
+            k = _key_to_str(self.n, k)
             
             if c > 0 and i > 0:
-                r += ' + '
+                parts.append(' + ')
             elif c < 0 and i > 0:
-                r += ' - '
+                parts.append(' - ')
             elif c < 0 and i == 0:
-                r += '-'
+                parts.append('-')
             
             if c.denominator == 1:
                 if abs(c.numerator) != 1:
-                    r += str(abs(c.numerator))
+                    parts.append(str(abs(c.numerator)))
             else:
-                r += f"\\frac{{{abs(c.numerator)}}}{{{c.denominator}}}"
+                parts.append(
+                    f"\\frac{{{abs(c.numerator)}}}{{{c.denominator}}}"
+                )
             
-            if k[0] != ',' and k[-1] != ',':
-                r += f"\\omega_{{{k}}}"
-            elif k[-1] != ',':
-                r += f"\\omega_{{\\emptyset{k}}}"
+            if k[-1] == ',':
+                parts.append(f"\\omega_{{{k}\\emptyset}}")
+            elif k[0] == ',':
+                parts.append(f"\\omega_{{\\emptyset{k}}}")
             else:
-                r += f"\\omega_{{{k}\\emptyset}}"
+                parts.append(f"\\omega_{{{k}}}")
         
-        return r
+        return ''.join(parts)
     
     
     def __rmul__(self, other):
@@ -166,7 +371,7 @@ class DupontForm:
         Scalar multiplicaiton of Dupont forms.
         """
         try:
-            other = fractions.Fraction(other)
+            other = to_Q(other)
         except:
             raise TypeError('Invalid scalar multiplication.')
         
@@ -202,12 +407,13 @@ class DupontForm:
         
         # case where one of the forms is zero
         if self.is_zero:
-            return deepcopy(other)
+            return DupontForm._from_canonical(other.n, other.form.copy())
         if other.is_zero:
-            return deepcopy(self)
+            return DupontForm._from_canonical(self.n, self.form.copy())
         
-        # actual sum
-        out_form = deepcopy(self.form)
+        # actual sum (keys and coefficients are immutable, a shallow copy is
+        # enough)
+        out_form = self.form.copy()
         for w, c in other.form.items():
             if w in out_form:
                 out_form[w] += c
@@ -215,61 +421,57 @@ class DupontForm:
                     del out_form[w]
             else:
                 out_form[w] = c
-        return DupontForm(self.n, out_form)
+        return DupontForm._from_canonical(self.n, out_form)
     
     def d(self):
         """
         Differential of Dupont form.
         """
         out_n = self.n
-        out_form = DupontForm.zero(out_n)
+        acc = dict()
         
         for k, c in self.form.items():
-            I, J = k.split(',')
-            I = [int(i) for i in I.split('|')]
-            J = [int(j) for j in list(J)]
-            for cnt, (i, j) in  enumerate(
-                    zip([x for x in range(1, out_n+1) if x not in I], J)):
-                    
-                sign = (-1)**(j + (i - 1 - cnt))
-                out_I = '|'.join([str(y) for y in 
-                                  I[:i - 1 - cnt] + [i] + I[i - 1 - cnt:]])
-                out_J = ''.join([str(z) for z in J[:cnt] + J[cnt + 1:]])
-                
-                out_form += DupontForm(out_n, {f"{out_I},{out_J}": sign * c})
+            for out_k, sign in _d_basis(out_n, k):
+                acc[out_k] = acc.get(out_k, 0) + sign * c
+                if acc[out_k] == 0:
+                    del acc[out_k]
         
-        return out_form
+        return DupontForm._from_canonical(out_n, acc)
         
         
     def i(self):
         """
         Map i of the contraction, returns a SullivanForm.
         """
+        return self._i_cached().copy()
+    
+    
+    def _i_cached(self):
+        """
+        Image under i, computed once per Dupont form (and shared).
+        """
+        if self._i_cache is None:
+            self._i_cache = self._i()
+        return self._i_cache
+    
+    
+    def _i(self):
         out_n = self.n
-        out_form = csf.SullivanForm(out_n, dict())
+        acc = dict()
         
+        # linear combination of the cached images of the basic forms
         for k, c in self.form.items():
-            I, J = k.split(',')
-            dx = csf.SullivanForm(out_n, {I: {'|'.join(['0'] * out_n): c}})
-            
-            I = I.split('|')
-            
-            J = list(J)
-            J.reverse()
-            for i in range(1, out_n + 1):
-                if str(i) not in I:
-                    j = J.pop()
-                    
-                    if j == '0':
-                        dx *= csf.SullivanForm(out_n, f"1 - x_{i}")
-                    else:
-                        dx *= csf.SullivanForm(out_n, f"x_{i}")
-            
-            out_form += dx
+            for dt, p in _basis_i(out_n, k).form.items():
+                for m, c_m in p.items():
+                    caf._iadd_term(acc, dt, m, c * c_m)
         
-        return out_form
+        return csf.SullivanForm._from_canonical(
+            out_n,
+            {dt: p for dt, p in acc.items() if p}
+        )
     
     
+    @staticmethod
     def tree_product(tree):
         """
         Compute the basic operation of the Cobar(Bar(Com))-algebra structure on
@@ -291,11 +493,21 @@ class DupontForm:
         """
         return DupontForm._tree_product(tree)
     
+    @staticmethod
     def _tree_product(tree, root=True):
         
         if len(tree) < 2:
             raise TypeError('Invalid tree.')
         
+        # at the root, check once whether the whole tree vanishes by degree
+        # reasons before computing any Sullivan form
+        if root:
+            leaf = tree
+            while not isinstance(leaf, DupontForm):
+                leaf = leaf[0]
+            if _degree_lower_bound(tree, leaf.n) is None:
+                return DupontForm.zero(leaf.n)
+        
         aux_tree = []
         for sub_tree in tree:
             # if it is a Dupont form
@@ -303,7 +515,8 @@ class DupontForm:
                 # any appearance of zero makes the whole thing zero
                 if sub_tree.is_zero:
                     return DupontForm.zero(sub_tree.n)
-                aux_tree.append(sub_tree.i())
+                # i is computed only once for each leaf, not once per tree
+                aux_tree.append(sub_tree._i_cached())
             # otherwise iterate
             else:
                 aux_tree.append(DupontForm._tree_product(sub_tree, root=False))
@@ -314,11 +527,12 @@ class DupontForm:
         # now we have just a list of Sullivan form, take the product and apply
         # h or p depending if we are at the root or not
         if root:
-            return np.product(aux_tree).p()
+            return _balanced_product(aux_tree).p()
         else:
-            return np.product(aux_tree).h()
+            return _balanced_product(aux_tree, positive_degree=True).h()
     
     
+    @staticmethod
     def a_infinity_product(*args):
         
         for duf in args:
@@ -333,16 +547,30 @@ class DupontForm:
         
         arity = len(args)
         
-        out_form = DupontForm.zero(out_n)
-        for tree in btg.binary_tree_generator(arity):
-            sign = tree[0]
-            tree = btg.map_args(tree, args)
+        # every tree has the same leaves and arity - 2 internal vertices other
+        # than the root, which gives a common lower bound for the degree
+        if arity >= 2:
+            if any(duf.is_zero for duf in args):
+                return DupontForm.zero(out_n)
+            min_deg = sum(
+                min(_popcount(I_mask) for I_mask, _ in duf.form)
+                for duf in args
+            )
+            if min_deg - (arity - 2) > out_n:
+                return DupontForm.zero(out_n)
+        
+        acc = dict()
+        for sign, tree in _binary_trees(arity):
+            tree = _map_leaves(tree, args)
             
-            form = sign*DupontForm.tree_product(tree)
+            form = DupontForm.tree_product(tree)
             
-            out_form += form
+            for k, c in form.form.items():
+                acc[k] = acc.get(k, 0) + sign * c
+                if acc[k] == 0:
+                    del acc[k]
         
-        return out_form
+        return DupontForm._from_canonical(out_n, acc)
 
 
 if __name__ == '__main__':
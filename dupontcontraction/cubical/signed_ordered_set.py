@@ -1,16 +1,76 @@
 """
 Class for ordered sets, returns the shuffle sign whenever adding elements
 (added from the right) or joining sets together.
+
+The function sort_and_sign gives the same result for a whole sequence at once,
+without building the linked list.
 """
 
+
+def sort_and_sign(iterable):
+    """
+    Sort a sequence of distinct elements and compute the sign of the sorting
+    permutation.
+
+    Parameters
+    ----------
+    iterable : iterable
+        Elements to sort.
+
+    Returns
+    -------
+    list
+        The sorted elements (repetitions removed).
+    int
+        Sign of the permutation, or 0 if there are repeated elements.
+
+    """
+    elements = list(iterable)
+    order = sorted(range(len(elements)), key=elements.__getitem__)
+    out = [elements[k] for k in order]
+    
+    # repeated elements give 0
+    for k in range(1, len(out)):
+        if out[k - 1] == out[k]:
+            return sorted(set(out)), 0
+    
+    # parity of the permutation from its cycle decomposition
+    parity = 0
+    visited = [False] * len(order)
+    for start in range(len(order)):
+        if visited[start]:
+            continue
+        # a cycle of length l contributes l - 1 transpositions
+        curr = start
+        while not visited[curr]:
+            visited[curr] = True
+            curr = order[curr]
+            parity += 1
+        parity -= 1
+    
+    return out, (-1)**(parity & 1)
+
 class SignedOrderedSet():
     
-    def __init__(self, iterable=None):
+    def __init__(self, iterable=None, sorted_unique=False):
         self.start = None  # smallest element
         self.end = None  # biggest elements
         self.set = dict()  # key => [previous, next]
         self._sign = 1  # permutation sign
         
+        # elements already sorted without repetitions: link them in order
+        if sorted_unique and iterable is not None:
+            prev = None
+            for el in iterable:
+                self.set[el] = [prev, None]
+                if prev is None:
+                    self.start = el
+                else:
+                    self.set[prev][1] = el
+                prev = el
+            self.end = prev
+            return
+        
         if iterable is not None:
             for el in iterable:
                 self.add_el(el)
@@ -71,9 +131,38 @@ class SignedOrderedSet():
     
     
     def __add__(self, other):
-        out = SignedOrderedSet(self.set)
-        for el in other:
-            out.add_el(el)
+        if not isinstance(other, SignedOrderedSet):
+            out = SignedOrderedSet(self.set)
+            for el in other:
+                out.add_el(el)
+            return out
+        
+        # sign of the elements of self in insertion order
+        _, sign = sort_and_sign(self.set)
+        
+        # linear merge of the two sorted sequences, counting the inversions
+        a, b = list(self), list(other)
+        merged = []
+        inv = 0
+        i, j = 0, 0
+        while i < len(a) and j < len(b):
+            if a[i] < b[j]:
+                merged.append(a[i])
+                i += 1
+            elif a[i] > b[j]:
+                merged.append(b[j])
+                inv += len(a) - i
+                j += 1
+            else:
+                merged.append(a[i])
+                sign = 0  # repeated elements give 0
+                i += 1
+                j += 1
+        merged.extend(a[i:])
+        merged.extend(b[j:])
+        
+        out = SignedOrderedSet(merged, sorted_unique=True)
+        out._sign = sign * (-1)**(inv & 1)
         return out
     
     
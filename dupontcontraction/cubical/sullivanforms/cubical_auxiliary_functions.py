@@ -1,4 +1,83 @@
-import itertools as it
+import operator
+from functools import lru_cache
+from types import MappingProxyType
+
+
+# number of set bits (int.bit_count only exists from Python 3.10 onwards)
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    def _popcount(mask):
+        return bin(mask).count('1')
+
+
+@lru_cache(maxsize=None)
+def _mask_to_dx(mask):
+    """
+    Sorted tuple of indices i such that bit i - 1 of mask is set.
+    """
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length())
+        mask ^= low
+    return tuple(out)
+
+
+def _merge_sign(mask1, mask2):
+    """
+    Sign of the permutation ordering the concatenation of the (sorted) indices
+    of mask1 followed by those of mask2, which need to be disjoint. Every
+    element of mask2 has to move past the elements of mask1 bigger than it.
+    """
+    inv = 0
+    while mask2:
+        low = mask2 & -mask2
+        inv += _popcount(mask1 >> low.bit_length())
+        mask2 ^= low
+    return -1 if inv & 1 else 1
+
+
+@lru_cache(maxsize=None)
+def _zero_monomial(n):
+    """
+    Exponents (0, ..., 0) of the constant monomial in n variables.
+    """
+    return (0,) * n
+
+
+def _read_only_form(form):
+    """
+    Read-only view of a dict in the format of the forms, with read-only
+    polynomials (auxiliary function). Polynomials that are already read-only
+    (taken from another form) are shared as they are.
+    """
+    return MappingProxyType({
+        dx: p if type(p) is MappingProxyType else MappingProxyType(p)
+        for dx, p in form.items()
+    })
+
+
+def _iadd_term(acc, dx, m, coeff):
+    """
+    Add coeff*m*dx in place to the accumulator acc, a dict in the format of
+    the forms. Monomials cancelling out are removed, but the (possibly empty)
+    polynomials are left in acc.
+    """
+    p = acc.get(dx)
+    if p is None:
+        acc[dx] = {m: coeff}
+        return
+    c = p.get(m)
+    if c is None:
+        p[m] = coeff
+    else:
+        c += coeff
+        if c:
+            p[m] = c
+        else:
+            del p[m]
+
 
 def _add_polynomials(p1, p2):
     """
@@ -19,13 +98,17 @@ def _add_polynomials(p1, p2):
     """        
     p_out = p1.copy()
     
+    # single dictionary lookup per monomial of p2
     for m, coeff in p2.items():
-        if m in p_out:
-            p_out[m] += coeff
-            if p_out[m] == 0:
-                del p_out[m]
-        else:
+        c = p_out.get(m)
+        if c is None:
             p_out[m] = coeff
+        else:
+            c += coeff
+            if c:
+                p_out[m] = c
+            else:
+                del p_out[m]
             
     return p_out
 
@@ -46,23 +129,32 @@ def _multiply_polynomials(p1, p2):
         Product of the polynomials.
 
     """
+    # multiplying by a single monomial shifts the exponents injectively, so
+    # no two terms can collide (most factors in h are of this kind)
+    if len(p1) == 1:
+        p1, p2 = p2, p1
+    if len(p2) == 1:
+        (m2, c2), = p2.items()
+        return {tuple(map(operator.add, m1, m2)): c1*c2
+                for m1, c1 in p1.items()}
+    
     p_out = {}
+    items2 = list(p2.items())
     
-    for m1, m2 in it.product(p1, p2):
-        c1, c2 = p1[m1], p2[m2]
-        
-        m_out = '|'.join(
-            [str(int(k1) + int(k2)) for k1, k2 \
-             in zip(m1.split('|'), m2.split('|'))]
-        )
-        
-        c_out = c1*c2
-        
-        if m_out in p_out:
-            p_out[m_out] += c_out
-            if p_out[m_out] == 0:
-                del p_out[m_out]
-        else:
-            p_out[m_out] = c_out
+    for m1, c1 in p1.items():
+        for m2, c2 in items2:
+            # exponents add up
+            m_out = tuple(map(operator.add, m1, m2))
+            c_out = c1*c2
+            
+            c = p_out.get(m_out)
+            if c is None:
+                p_out[m_out] = c_out
+            else:
+                c += c_out
+                if c:
+                    p_out[m_out] = c
+                else:
+                    del p_out[m_out]
     
-    return p_out
\ No newline at end of file
+    return p_out
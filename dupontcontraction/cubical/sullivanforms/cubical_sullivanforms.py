@@ -2,28 +2,30 @@
 Class for Sullivan forms in the cubical context.
 
 The base field is Q (the rational numbers).
+
+Sullivan forms are immutable: the content form of a Sullivan form and each of
+its polynomials are read-only views (types.MappingProxyType), set up once in
+__init__ and _from_canonical. Polynomials, and whole forms, are therefore
+shared between forms and caches (e.g. of products, differentials and parsed
+strings) without being copied.
 """
 
-import fractions
 import itertools as it
-import sys
-import os
+import bisect
+from functools import lru_cache
 import math
 
-
-sys.path.append(
-    os.path.dirname(
-        os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__))
-        )
-    )
-)
-
-from cubical.sullivanforms import cubical_auxiliary_functions as caf
-import cubical.dupontforms.cubical_dupontforms as cdf
+from . import cubical_auxiliary_functions as caf
+from ..signed_ordered_set import sort_and_sign
+from ...rationals import Q, to_Q
+from ..dupontforms import cubical_dupontforms as cdf
 
 class SullivanForm:
     
+    # many small forms are created during contractions, no instance dict;
+    # _hash, _latex and _masks are computed on first use
+    __slots__ = ('n', 'is_zero', 'form', '_hash', '_latex', '_masks')
+    
     def __init__(self, n, form):
         """
         Cubical Sullivan forms.
@@ -34,8 +36,11 @@ class SullivanForm:
             Simplicial dimension.
         is_zero : bool
             Indicates if the form is zero or not.
-        form : dict
-            Content of the form.
+        form : mapping
+            Content of the form. Keys are sorted tuples (i_1, ..., i_k) of
+            indices of dx, and each polynomial is a mapping with keys the
+            tuples of exponents (k_1, ..., k_n). Both are read-only views
+            (types.MappingProxyType): forms cannot be modified once built.
 
         Parameters
         ----------
@@ -50,6 +55,8 @@ class SullivanForm:
                 of the form k_1|...|k_n where n is the dimension indicating a
                 monomial coeff*x_1^{k_1}...x_n^{k_n}, and the associated
                 element is the coefficient
+                Both kinds of keys can also be given as tuples of integers,
+                (i_1, ..., i_k) and (k_1, ..., k_n) respectively.
             For a string argument:
                 Only accepts sums (+ or -) of terms written as
                     [coeff]*x_[j1]^[e1]*[...]*x_[jk]^[ek]*dx_[i1]*[...]*dx_[im]
@@ -75,57 +82,58 @@ class SullivanForm:
         
         self.n = n
         self.is_zero = False
+        self._hash, self._latex, self._masks = None, None, None
         
         if isinstance(form, str):
             out_form = SullivanForm._from_string(n, form)
             self.form = out_form.form
+            self.is_zero = out_form.is_zero
+            return
         
         if isinstance(form, dict):
             out_form = {}
             
             # Keys denote the dx_i and need to be of the form
-            # i_1|i_1|...|i_k with i_j between 1 and n
+            # i_1|i_1|...|i_k (or (i_1, ..., i_k)) with i_j between 1 and n
             # Repetitions make the form be zero
             for key in form:
-                if key:  # non-empty string
-                    split_key = [int(i) for i in key.split('|')]
-                    
-                    # check validity
-                    for i in split_key:
-                        if i < 1 or i > n:
-                            raise TypeError('invalid form')
-                    
-                    # if we have too many dx_i we get zero
-                    if len(split_key) > n:
-                        continue
-                    
-                    # sign of permutation to order the dx_i
-                    sign = 1
-                    for (x, y) in it.combinations(split_key, 2):
-                        if x == y:
-                            sign = 0
-                            break
-                        if x > y:
-                            sign *= -1
-                    
-                    if sign == 0:
-                        continue
-                    
-                    # sort
-                    split_key.sort()
-                else:  # empty string
-                    split_key = []
-                    sign = 1
+                if isinstance(key, str):
+                    if key:  # non-empty string
+                        split_key = tuple(map(int, key.split('|')))
+                    else:
+                        split_key = ()
+                else:
+                    split_key = tuple(map(int, key))
+                
+                # check validity
+                for i in split_key:
+                    if i < 1 or i > n:
+                        raise TypeError('invalid form')
+                
+                # if we have too many dx_i we get zero
+                if len(split_key) > n:
+                    continue
+                
+                # sort, with the sign of the permutation ordering the dx_i
+                # (zero for repeated dx_i)
+                split_key, sign = sort_and_sign(split_key)
+                
+                if sign == 0:
+                    continue
                 
                 # Element associated to the key are again dictionaries with
-                # keys k_1|k_1|...|k_n (corresponding to the monomial
-                # x_1^k_1*...*t_n^k_n) linked to the coefficient (string or
-                # fraction.Fraction)
+                # keys k_1|k_1|...|k_n or (k_1, ..., k_n) (corresponding to the
+                # monomial x_1^k_1*...*t_n^k_n) linked to the coefficient
+                # (string or rational number, stored as gmpy2.mpq if available
+                # and as fractions.Fraction otherwise)
                 monomials = form[key]
                 out_monomials = {}
                 
                 for m in monomials:
-                    split_m = [int(k) for k in m.split('|')]
+                    if isinstance(m, str):
+                        split_m = tuple(map(int, m.split('|')))
+                    else:
+                        split_m = tuple(map(int, m))
                     
                     # checks
                     if len(split_m) != n:
@@ -134,84 +142,183 @@ class SullivanForm:
                         if k < 0:
                             raise TypeError('invalid form')
                     
-                    # coefficient
-                    coeff = sign*fractions.Fraction(monomials[m])
-                    if coeff == 0:
-                        continue
-                    out_monomials[m] = coeff
+                    # coefficient (to_Q returns rationals unchanged, and the
+                    # sign is only applied when it is -1)
+                    coeff = to_Q(monomials[m])
+                    if sign < 0:
+                        coeff = -coeff
+                    if split_m in out_monomials:
+                        coeff += out_monomials[split_m]
+                    out_monomials[split_m] = coeff
+                
+                out_monomials = {m: c for m, c in out_monomials.items() if c}
                     
-                # if non-empty list of monomials, save to output
+                # if non-empty list of monomials, save to output (different
+                # keys can give the same ordered dx)
                 if out_monomials:
-                    out_key = '|'.join([str(i) for i in split_key])
+                    out_key = tuple(split_key)
+                    if out_key in out_form:
+                        out_monomials = caf._add_polynomials(
+                            out_form[out_key], out_monomials
+                        )
+                        if not out_monomials:
+                            del out_form[out_key]
+                            continue
                     out_form[out_key] = out_monomials
             
-            if out_form:
-                self.form = out_form
-            else:
-                self.is_zero = True
-                self.form = {}
+            self.form = caf._read_only_form(out_form)
+            self.is_zero = not out_form
             
             return
     
     
+    @staticmethod
+    @lru_cache(maxsize=1024)
     def _from_string(n, form):
         # remove all spaces
         form = form.replace(' ', '')
         
-        # split +
-        if '+' in form:
-            return sum([SullivanForm(n, f) for f in form.split('+')])
-        
-        # split - (careful for - at the start)
-        if '-' in form:
-            factors = form.split('-')
+        # split into signed terms in a single pass (careful for - at the start)
+        terms = []
+        sign, start = 1, 0
+        for k, char in enumerate(form):
+            if char == '+' or char == '-':
+                if k > 0:
+                    terms.append((sign, form[start:k]))
+                sign = -1 if char == '-' else 1
+                start = k + 1
+        terms.append((sign, form[start:]))
+        
+        # each term is a product of a coefficient, x_j^e and dx_i factors,
+        # accumulated directly into the output
+        out_form = {}
+        for sign, term in terms:
+            coeff = to_Q(sign)
+            exponents = [0] * n
+            dx = []
+            for factor in term.split('*'):
+                # dx
+                if factor[0:2] == 'dx':
+                    dx.append(int(factor[3:]))
+                # x
+                elif factor[0] == 'x':
+                    if '^' in factor:
+                        x, e = factor.split('^')
+                    else:
+                        x, e = factor, '1'
+                    exponents[int(x[2:]) - 1] += int(e)
+                # coefficient
+                else:
+                    coeff *= to_Q(factor)
             
-            if form[0] == '-':
-                factors = [SullivanForm(n, f) for f in factors[1:]]
-            else:
-                factors = [SullivanForm(n, f) for f in factors]
-                factors[0] = - factors[0]
-            return -sum(factors)
-        
-        # products
-        if '*' in form:
-            out_form = SullivanForm.one(n)
-            for x in [SullivanForm(n, f) for f in form.split('*')]:
-                out_form *= x
-            return out_form
-        
-        # dx
-        if form[0:2] == 'dx':
-            return SullivanForm(n, {form[3:]: {'|'.join(['0'] * n): 1}})
-        # x
-        elif form[0] == 'x':
-            if '^' in form:
-                x, e = form.split('^')
-            else:
-                x, e = form, '1'
-            i = int(x[2:]) - 1
-            I = ['0'] * n
-            I[i] = e
-            return SullivanForm(n, {'': {'|'.join(I): 1}})
-        # coefficient
-        else:
-            return fractions.Fraction(form) * SullivanForm.one(n)
+            # checks
+            for i in dx:
+                if i < 1 or i > n:
+                    raise TypeError('invalid form')
+            for e in exponents:
+                if e < 0:
+                    raise TypeError('invalid form')
+            
+            dx, dx_sign = sort_and_sign(dx)
+            if dx_sign == 0 or coeff == 0:
+                continue
+            if dx_sign < 0:
+                coeff = -coeff
+            caf._iadd_term(out_form, tuple(dx), tuple(exponents), coeff)
         
-        raise NotImplementedError('I cannot understand this string.')
+        return SullivanForm._from_canonical(
+            n,
+            {dx: p for dx, p in out_form.items() if p}
+        )
+    
+    
+    @staticmethod
+    def _from_canonical(n, form):
+        """
+        Wrap a dict already in the internal format (sorted dx tuples, exponent
+        tuples, non-zero rational coefficients, no empty polynomial) into a
+        Sullivan form without going through the validation of __init__.
+        """
+        out = SullivanForm.__new__(SullivanForm)
+        out.n = n
+        out.form = caf._read_only_form(form)
+        out.is_zero = not form
+        out._hash, out._latex, out._masks = None, None, None
+        return out
     
     
     def zero(n):
         """
         The zero form.
         """
-        return SullivanForm(n, dict())
+        return SullivanForm._from_canonical(n, dict())
     
     
     def one(n):
         """
         The one form.
         """
-        return SullivanForm(n, {'': {'|'.join(['0'] * n): '1'}})
+        return SullivanForm(n, {(): {caf._zero_monomial(n): '1'}})
+    
+    
+    @staticmethod
+    def _constant(n, coeff):
+        """
+        The constant form coeff.
+        """
+        coeff = to_Q(coeff)
+        if coeff == 0:
+            return SullivanForm.zero(n)
+        return SullivanForm._from_canonical(
+            n, {(): {caf._zero_monomial(n): coeff}}
+        )
+    
+    
+    @staticmethod
+    def _monomial(n, exponents, coeff=1, dx=()):
+        """
+        The form coeff*x_1^{k_1}...x_n^{k_n}*dx, for exponents (k_1, ..., k_n)
+        and dx a sorted tuple of indices.
+        """
+        coeff = to_Q(coeff)
+        if coeff == 0:
+            return SullivanForm.zero(n)
+        return SullivanForm._from_canonical(n, {dx: {tuple(exponents): coeff}})
+    
+    
+    @staticmethod
+    def _dx(n, j, coeff=1):
+        """
+        The form coeff*dx_j.
+        """
+        return SullivanForm._monomial(n, caf._zero_monomial(n), coeff, (j,))
+    
+    
+    @staticmethod
+    def _x_power(n, j, e):
+        """
+        Exponent tuple of the monomial x_j^e.
+        """
+        m = [0] * n
+        m[j - 1] = e
+        return tuple(m)
+    
+    
+    @staticmethod
+    def _h1_form(n, j, e, coeff=1):
+        """
+        The form coeff/(e+1)*(x_j^{e+1} - x_j), that is h applied to
+        x_j^e*dx_j in dimension one.
+        """
+        if e == 0:
+            return SullivanForm.zero(n)
+        c = to_Q(coeff) / (e + 1)
+        if c == 0:
+            return SullivanForm.zero(n)
+        return SullivanForm._from_canonical(n, {(): {
+            SullivanForm._x_power(n, j, e + 1): c,
+            SullivanForm._x_power(n, j, 1): -c,
+        }})
     
     
     def copy(self):
@@ -224,10 +331,7 @@ class SullivanForm:
             A copy of self
 
         """
-        return SullivanForm(
-            self.n,
-            {dt: {m: c for m, c in p.items()} for dt, p in self.form.items()}
-        )
+        return SullivanForm._from_canonical(self.n, self.form)
         
         
     def __repr__(self):
@@ -240,74 +344,77 @@ class SullivanForm:
             LaTeX string.
 
         """
-        
+        if self._latex is None:
+            self._latex = self._to_latex()
+        return self._latex
+    
+    
+    def _to_latex(self):
         if self.is_zero:
             return '0'
         
-        r = ''
+        r_parts = []
         for k, ds in enumerate(self.form):
             monomials = self.form[ds]
             n_monomials = len(monomials)
             
             # polynomial
-            p = ''
+            p_parts = []
             for i, m in enumerate(monomials):
                 coeff = monomials[m]
                 
                 if i > 0:
-                    p += ' '
+                    p_parts.append(' ')
                 
                 if coeff < 0:
                     c = -coeff
-                    p += '-'
+                    p_parts.append('-')
                 elif i == 0:
                     c = coeff
                 else:
                     c = coeff
-                    p += '+'
+                    p_parts.append('+')
                 
                 if i > 0:
-                    p += ' '
+                    p_parts.append(' ')
                     
                 if c == 1:
-                    if m == '|'.join(['0' for j in range(self.n)]) \
-                        and (ds == '' or len(monomials) > 1):
-                        
-                        p += '1'
-                    else:
-                        pass
-                        
+                    if not any(m) and (not ds or len(monomials) > 1):
+                        p_parts.append('1')
                 else:
                     if c.denominator != 1:
-                        p += f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
+                        p_parts.append(
+                            f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
+                        )
                     else:
-                        p += f"{c.numerator}"
+                        p_parts.append(f"{c.numerator}")
                     
-                for j, e in enumerate(m.split('|')):
-                    if e == '1':
-                        p += f"x_{{{j + 1}}}"
-                    elif e != '0':
-                        p += f"x_{{{j + 1}}}^{{{e}}}"
+                for j, e in enumerate(m):
+                    if e == 1:
+                        p_parts.append(f"x_{{{j + 1}}}")
+                    elif e != 0:
+                        p_parts.append(f"x_{{{j + 1}}}^{{{e}}}")
+            p = ''.join(p_parts)
                         
             if len(p) > 0:
                 if n_monomials > 1:
                     if k > 0:
-                        r += ' + '
-                    r += f"\\left({p}\\right)"
+                        r_parts.append(' + ')
+                    r_parts.append(f"\\left({p}\\right)")
                 else:
                     if k > 0 and p[0] == '-':
-                        r += f" - {p[1:]}"
+                        r_parts.append(f" - {p[1:]}")
                     else:
                         if k > 0:
-                            r += ' + '
-                        r += f"{p}"
+                            r_parts.append(' + ')
+                        r_parts.append(p)
             if ds:
                 if k > 0 and len(p) == 0:
-                    r += ' + '
-                for i in ds.split('|'):
-                    r += f"dx_{{{i}}}"
+                    r_parts.append(' + ')
+                for i in ds:
+                    r_parts.append(f"dx_{{{i}}}")
                 
-        return r
+        return ''.join(r_parts)
     
     def __add__(self, sf):
         """
@@ -339,18 +446,34 @@ class SullivanForm:
         if sf.is_zero:
             return self.copy()
         
-        # actual addition
+        # actual addition: only the buckets present in both forms are merged
+        # (copied)
         n_out = self.n
-        form_out = self.copy().form
+        form_out = dict(self.form)
         for ds, p in sf.form.items():
-            if ds in form_out:
-                form_out[ds] = caf._add_polynomials(form_out[ds], p)
-                if not form_out[ds]:  # zero polynomial
-                    del form_out[ds]
-            else:
+            p_out = form_out.get(ds)
+            if p_out is None:
                 form_out[ds] = p
+                continue
+            
+            # merge into a copy of the bucket, one lookup per monomial
+            p_out = p_out.copy()
+            for m, c in p.items():
+                c_out = p_out.get(m)
+                if c_out is None:
+                    p_out[m] = c
+                else:
+                    c_out += c
+                    if c_out:
+                        p_out[m] = c_out
+                    else:
+                        del p_out[m]
+            if p_out:
+                form_out[ds] = p_out
+            else:  # zero polynomial
+                del form_out[ds]
         
-        return SullivanForm(n_out, form_out)
+        return SullivanForm._from_canonical(n_out, form_out)
     
     def __radd__(self, other):
         if other == 0:
@@ -368,7 +491,7 @@ class SullivanForm:
             Negation.
 
         """
-        return SullivanForm(
+        return SullivanForm._from_canonical(
             self.n,
             {dt: {m: -c for m, c in p.items()} for dt, p in self.form.items()}
         )
@@ -404,36 +527,42 @@ class SullivanForm:
         
         # case where one of the forms is zero
         if self.is_zero or sf.is_zero:
-            return SullivanForm(self.n, {})
+            return SullivanForm.zero(self.n)
         
-        # actual multiplication
+        return _mul_cached(self, sf)
+    
+    
+    def _mul(self, sf, positive_degree=False):
+        # actual multiplication; with positive_degree the degree 0 part of
+        # the product is left out (e.g. when h is applied right after, since
+        # h vanishes on it)
         n_out = self.n
         form_out = {}
         # pairs of dt_i combinations
-        for dt1, dt2 in it.product(self.form, sf.form):
-            dt1_split, dt2_split = dt1.split('|'), dt2.split('|')
-            if dt1 == '':
-                dt1_split = []
-            if dt2 == '':
-                dt2_split = []
-            
-            # if dt1 and dt2 have common element, we get zero
-            if not set(dt1_split).isdisjoint(dt2_split):
-                continue
-            # otherwise the resulting dt is the union of the two and the
-            # polynomial is the product of polynomials
-            dt = '|'.join(dt1_split + dt2_split)
-            p = caf._multiply_polynomials(self.form[dt1], sf.form[dt2])
-            
-            if dt in form_out:
-                form_out[dt] = caf._add_polynomials(form_out[dt], p)
-            else:
-                form_out[dt] = p
-            
-            if not form_out[dt]:
-                del form_out[dt]
+        masks2 = sf._dx_masks
+        for dt1, mask1 in self._dx_masks.items():
+            for dt2, mask2 in masks2.items():
+                # if dt1 and dt2 have common element, we get zero
+                if mask1 & mask2:
+                    continue
+                if positive_degree and not (mask1 | mask2):
+                    continue
+                # otherwise the resulting dt is the (ordered) union of the two
+                # and the polynomial is the product of polynomials
+                dt = caf._mask_to_dx(mask1 | mask2)
+                p = caf._multiply_polynomials(self.form[dt1], sf.form[dt2])
+                if caf._merge_sign(mask1, mask2) < 0:
+                    p = {m: -c for m, c in p.items()}
+                
+                if dt in form_out:
+                    form_out[dt] = caf._add_polynomials(form_out[dt], p)
+                else:
+                    form_out[dt] = p
+                
+                if not form_out[dt]:
+                    del form_out[dt]
         
-        return SullivanForm(n_out, form_out)
+        return SullivanForm._from_canonical(n_out, form_out)
     
     
     def __rmul__(self, other):
@@ -442,16 +571,23 @@ class SullivanForm:
 
         Parameters
         ----------
-        other : int or Fraction
+        other : int or rational
             Scalar.
 
         Returns
         -------
-        TYPE
-            DESCRIPTION.
+        SullivanForm
+            Product of the scalar with the form.
 
         """
-        return SullivanForm(
+        other = to_Q(other)
+        if other == 0:
+            return SullivanForm.zero(self.n)
+        if other == 1:
+            return self.copy()
+        if other == -1:
+            return -self
+        return SullivanForm._from_canonical(
             self.n,
             {dt: {m: other*c for m, c in p.items()} \
              for dt, p in self.form.items()}
@@ -462,58 +598,76 @@ class SullivanForm:
         """
         Check for equality of Sullivan forms. Since we work in free algebras in
         the cubical case, we only need to compare the coefficients of the
-        monomials.
+        monomials. Zero coefficients and empty polynomials are never stored,
+        so this is a comparison of (nested) dicts.
         """
-        
-        for dt, p in self.form.items():
-            if dt not in other.form:
-                return False
-            for m, c in p.items():
-                if m not in other.form[dt] or c != other.form[dt][m]:
-                    return False
-        
-        for dt, p in other.form.items():
-            if dt not in self.form:
-                return False
-            for m, c in p.items():
-                if m not in self.form[dt] or c != self.form[dt][m]:
-                    return False
-        
-        return True
+        if not isinstance(other, SullivanForm) or self.n != other.n:
+            return False
+        if self.is_zero and other.is_zero:
+            return True
+        return self.form == other.form
+    
+    
+    def __hash__(self):
+        # the content is read-only, so the hash is computed once
+        if self._hash is None:
+            self._hash = hash(frozenset(
+                (dt, frozenset(p.items())) for dt, p in self.form.items()
+            ))
+        return self._hash
+    
+    
+    @property
+    def _dx_masks(self):
+        """
+        Bitmask of each dx key (bit i - 1 set iff dx_i appears).
+        """
+        if self._masks is None:
+            masks = {}
+            for dt in self.form:
+                mask = 0
+                for i in dt:
+                    mask |= 1 << (i - 1)
+                masks[dt] = mask
+            self._masks = masks
+        return self._masks
     
     
     def d(self):
         """
         Differential.
         """
+        return _d_cached(self)
+    
+    
+    def _d(self):
         out_n = self.n
-        out_form = SullivanForm.zero(out_n)
+        out_form = {}
         
         for dx, p in self.form.items():
+            targets = _d_targets(out_n, dx)
             for m, c in p.items():
                 # d(monomial)
-                split_m = [int(e) for e in m.split('|')]
-                for i, e in enumerate(split_m):
+                for i, aux_dx, sign in targets:
+                    e = m[i]
                     if e == 0:
                         continue
                     
-                    aux_split_m = [*split_m]
-                    aux_split_m[i] -= 1
-                    
-                    aux_m = '|'.join([str(x) for x in aux_split_m])
-                    aux_c = c * e
-                    if dx == '':
-                        aux_dx = str(i + 1)
-                    else:
-                        aux_dx = f"{i + 1}|{dx}"
+                    aux_m = m[:i] + (e - 1,) + m[i + 1:]
+                    aux_c = sign * c * e
                     
                     # add term to final form
-                    out_form += SullivanForm(
-                        out_n,
-                        {aux_dx: {aux_m: aux_c}}
-                    )
+                    aux_p = out_form.setdefault(aux_dx, {})
+                    c_out = aux_p.get(aux_m, 0) + aux_c
+                    if c_out:
+                        aux_p[aux_m] = c_out
+                    else:
+                        del aux_p[aux_m]
         
-        return out_form
+        return SullivanForm._from_canonical(
+            out_n,
+            {dx: p for dx, p in out_form.items() if p}
+        )
     
     
     def p(self):
@@ -528,30 +682,37 @@ class SullivanForm:
         """
         
         out_n = self.n
-        out_form = cdf.DupontForm.zero(out_n)
+        # coefficients of the encoded keys, wrapped into a form at the end
+        out_form = {}
         
         for dx, p in self.form.items():
-            I = dx
-            
-            if dx != '':
-                dx = [int(i) for i in dx.split('|')]
-            else:
-                dx = []
+            # encoded key of the Dupont form (see cubical.DupontForm)
+            I_mask = self._dx_masks[dx]
                 
             for m, c in p.items():
-                J = ''
-                for i, e in enumerate([int(x) for x in m.split('|')]):
+                # in the directions without dx, x^e (e > 0) only takes the
+                # value 1 at the vertex 1, while the constant 1 takes it at
+                # both vertices
+                J_masks, cnt = [0], 0
+                for i, e in enumerate(m):
                     i = i + 1
-                    e = fractions.Fraction(e)
                     if i in dx:
-                        c *= 1 / (e + 1)
-                    elif e == 0:
-                        J += '0'
+                        c = c / (e + 1)
                     else:
-                        J += '1'
-                out_form += cdf.DupontForm(out_n, {f"{I},{J}": c})
-        
-        return out_form
+                        bit = 1 << cnt
+                        if e != 0:
+                            J_masks = [J_mask | bit for J_mask in J_masks]
+                        else:
+                            J_masks += [J_mask | bit for J_mask in J_masks]
+                        cnt += 1
+                for J_mask in J_masks:
+                    key = (I_mask, J_mask)
+                    out_form[key] = out_form.get(key, 0) + c
+        
+        return cdf.DupontForm._from_canonical(
+            out_n,
+            {key: c for key, c in out_form.items() if c}
+        )
     
     
     def h(self, symmetric=True):
@@ -566,133 +727,163 @@ class SullivanForm:
         """
         
         out_n = self.n
-        out_form = SullivanForm.zero(out_n)
+        # terms are accumulated in place, wrapped into a form at the end
+        acc = {}
+        # the factors are multiplied together starting from 1, and the
+        # scalar (sign, coefficient, choice factor) is only applied when
+        # accumulating the product
+        unit = SullivanForm._constant(out_n, 1)
         
         if not symmetric:
             for dx, p in self.form.items():
                 # degree 0 gives 0
-                if dx == '':
+                if not dx:
                     continue
                 
-                I = [int(i) for i in dx.split('|')]
+                I = dx
                 for m, c in p.items():
-                    m = [fractions.Fraction(e) for e in m.split('|')]
                     for cnt, i in enumerate(I):
                         # sign comes from Koszul
-                        new_m = SullivanForm(out_n, f"{(-1)**cnt * c}")
+                        scalar = -c if cnt & 1 else c
+                        new_m = unit
                         
                         for j, e in enumerate(m):
                             j = j + 1
-                            if j < i and  j in I:
-                                new_m = (new_m *
-                                         SullivanForm(out_n, f"{1/(e+1)}*dx_{j}")
-                                         )
-                            elif j < i and j not in I and e == 0:
-                                new_m = (new_m *
-                                         SullivanForm(out_n, f"1 - x_{j}")
-                                         )
-                            elif j < i and j not in I and e > 0:
-                                new_m = (new_m *
-                                         SullivanForm(out_n, f"x_{j}")
-                                         )
+                            if j < i:
+                                new_m = new_m * _p1i1_factor(out_n, j, e,
+                                                             j in I)
                             elif j == i:
-                                new_m = (new_m *
-                                         SullivanForm(out_n,
-                                                      (f"{1/(e+1)}*x_{j}^{e+1} -"
-                                                       f" {1/(e+1)}*x_{j}"))
-                                         )
-                            elif j > i and j in I:
-                                new_m = (new_m *
-                                         SullivanForm(out_n,
-                                                      f"x_{j}^{e}*dx_{j}")
-                                         )
+                                new_m = new_m * _h1_factor(out_n, j, e)
                             else:
-                                new_m = (new_m *
-                                         SullivanForm(out_n,
-                                                      f"x_{j}^{e}")
-                                         )
-                        out_form += new_m
+                                new_m = new_m * _identity_factor(out_n, j, e,
+                                                                 j in I)
+                        for dt, new_p in new_m.form.items():
+                            for new_mon, new_c in new_p.items():
+                                caf._iadd_term(acc, dt, new_mon,
+                                               scalar * new_c)
         
         if symmetric:
             
             # functions to apply p o i and identity
-            def _p1i1(e, j, is_dx):
-                if is_dx:
-                    return SullivanForm(out_n, f"{1/(e+1)}*dx_{j}")
-                if e == 0:
-                    return SullivanForm(out_n, f"1 - x_{j}")
-                return SullivanForm(out_n, f"x_{j}")
-            
-            
-            def _identity(e, j, is_dx):
-                if is_dx:
-                    return SullivanForm(out_n, f"x_{j}^{e}*dx_{j}")
-                return SullivanForm(out_n, f"x_{j}^{e}")
-            
-            
             def _apply(flag, e, j, is_dx):
                 if flag == 0:
-                    return _identity(e, j, is_dx)
-                return _p1i1(e, j, is_dx)
+                    return _identity_factor(out_n, j, e, is_dx)
+                return _p1i1_factor(out_n, j, e, is_dx)
             
             
             def _h1(e, j):
-                return SullivanForm(out_n,
-                                    f"{1/(e+1)}*x_{j}^{e+1} -"
-                                    f" {1/(e+1)}*x_{j}")
+                return _h1_factor(out_n, j, e)
                 
             
             for dx, p in self.form.items():
                 # degree 0 gives 0
-                if dx == '':
+                if not dx:
                     continue
                 
-                I = [int(i) for i in dx.split('|')]
+                I = dx
                 for m, c in p.items():
-                    m = [fractions.Fraction(e) for e in m.split('|')]
                     for cnt, i in enumerate(I):
-                        # permutations
-                        for perm in it.product([0, 1], repeat=out_n - 1):
-                            # sign comes from Koszul
-                            new_m = SullivanForm(out_n, f"{(-1)**cnt * c}")
+                        # sign comes from Koszul
+                        signed_c = -c if cnt & 1 else c
                         
-                            # choice factor
-                            k = sum(perm)
-                            new_m = (math.factorial(k) *
-                                     math.factorial(out_n - k - 1) *
-                                     new_m)
+                        # permutations, with their choice factor
+                        for perm, weight in _perm_weight_table(out_n):
+                            scalar = weight * signed_c
+                            new_m = unit
                             
-                            for j, flag in enumerate(perm):
+                            # perm gives the choice for the variables other
+                            # than x_i, in increasing order
+                            flags = iter(perm)
+                            for j, e in enumerate(m):
                                 j = j + 1
-                                
                                 if j == i:
-                                    new_m = new_m * _h1(m[i - 1], i)
-                                
-                                if j < i:
-                                    e = m[j - 1]
-                                    new_m = new_m * _apply(flag, e, j, j in I)
+                                    new_m = new_m * _h1(e, i)
                                 else:
-                                    e = m[j]
                                     new_m = new_m * \
-                                        _apply(flag, e, j + 1, (j + 1) in I)
-                            out_form += new_m
+                                        _apply(next(flags), e, j, j in I)
+                            for dt, new_p in new_m.form.items():
+                                for new_mon, new_c in new_p.items():
+                                    caf._iadd_term(acc, dt, new_mon,
+                                                   scalar * new_c)
                             
-        return out_form
-                        
-        
+        return SullivanForm._from_canonical(
+            out_n,
+            {dx: p for dx, p in acc.items() if p}
+        )
+
+
+# Products and differentials of the same forms come up over and over when
+# computing tree products, so they are cached.
+@lru_cache(maxsize=4096)
+def _mul_cached(sf1, sf2, positive_degree=False):
+    return sf1._mul(sf2, positive_degree)
+
+
+@lru_cache(maxsize=4096)
+def _d_cached(sf):
+    return sf._d()
+
+
+# The one-variable factors of h only come in a few shapes for a given n.
+@lru_cache(maxsize=None)
+def _p1i1_factor(n, j, e, is_dx):
+    """
+    p o i applied to x_j^e (times dx_j if is_dx) in the variable x_j.
+    """
+    if is_dx:
+        return SullivanForm._dx(n, j, Q(1, e + 1))
+    if e == 0:
+        return SullivanForm._constant(n, 1)
+    return SullivanForm._monomial(n, SullivanForm._x_power(n, j, 1))
+
+
+@lru_cache(maxsize=None)
+def _identity_factor(n, j, e, is_dx):
+    """
+    The factor x_j^e (times dx_j if is_dx).
+    """
+    return SullivanForm._monomial(
+        n, SullivanForm._x_power(n, j, e), dx=(j,) if is_dx else ()
+    )
+
+
+@lru_cache(maxsize=None)
+def _h1_factor(n, j, e):
+    """
+    The one-dimensional h applied to x_j^e*dx_j.
+    """
+    return SullivanForm._h1_form(n, j, e)
+
+
+@lru_cache(maxsize=None)
+def _perm_weight_table(n):
+    """
+    Pairs (perm, k!*(n-k-1)!/n!) for the choices perm in {0, 1}^(n-1) used by
+    the symmetric h, with k the number of ones in perm. The weight is the
+    proportion of the orderings of the variables in which exactly the chosen
+    ones come before x_i, so that the weights add up to 1.
+    """
+    return tuple(
+        (perm, Q(math.factorial(sum(perm)) * math.factorial(n - sum(perm) - 1),
+                 math.factorial(n)))
+        for perm in it.product((0, 1), repeat=n - 1)
+    )
+
 
-if __name__ == '__main__':
-# =============================================================================
-#     sf1 = SullivanForm(3, {'': {'0|2|1': 3}, '1': {'1|0|0': 2}})
-#     print(sf1)
-#     print(sf1.p())
-#     
-#     sf2 = SullivanForm(3, '1 - x_1')
-#     print(sf2)
-# =============================================================================
-
-    sf3 = SullivanForm(3, "x_1*x_2^2*x_3*dx_1*dx_2")
-    print(sf3)
-    print(sf3.h())
-    print(sf3.h().h())
-    print(sf3.d().h(symmetric=False) + sf3.h(symmetric=False).d() == (sf3 - sf3.p().i()))
+@lru_cache(maxsize=None)
+def _d_targets(n, dx):
+    """
+    For the component dx of a form in dimension n, the triples (i, ordered dx
+    of dx_{i+1}*dx, sign) for the variables x_{i+1} with dx_{i+1} not already
+    in dx. Only depends on (n, dx), so it is computed once instead of for every
+    monomial.
+    """
+    out = []
+    for i in range(n):
+        if (i + 1) in dx:
+            continue
+        # dx_{i+1} is put in front of dx: the sign counts the dx_j with
+        # j < i + 1 it has to move past
+        pos = bisect.bisect_left(dx, i + 1)
+        out.append((i, dx[:pos] + (i + 1,) + dx[pos:], (-1)**pos))
+    return tuple(out)
@@ -1,8 +1,8 @@
 import pandas as pd
 import itertools as it
 
-import simplicial.sullivanforms.sullivanforms as sf
-import simplicial.dupontforms.dupontforms as duf
+import dupontcontraction.simplicial.sullivanforms.sullivanforms as sf
+import dupontcontraction.simplicial.dupontforms.dupontforms as duf
 
 if __name__ == '__main__':
     
@@ -0,0 +1,36 @@
+"""
+Rational numbers used for the coefficients of the forms.
+
+If gmpy2 is installed, coefficients are GMP rationals (gmpy2.mpq), otherwise
+they are fractions.Fraction. Both expose numerator and denominator and mix
+with integers in the same way.
+"""
+
+import numbers
+
+try:
+    from gmpy2 import mpq as Q
+except ImportError:
+    from fractions import Fraction as Q
+
+
+def to_Q(c):
+    """
+    Convert a coefficient (int, string, Fraction, mpq...) to Q.
+
+    Parameters
+    ----------
+    c : int, str or rational
+        Coefficient.
+
+    Returns
+    -------
+    Q
+        The coefficient as a rational number.
+
+    """
+    if type(c) is Q:
+        return c
+    if isinstance(c, numbers.Rational):
+        return Q(int(c.numerator), int(c.denominator))
+    return Q(c)
@@ -2,27 +2,135 @@
 Class for Dupont forms.
 """
 
-import itertools as it
-import fractions
-from copy import deepcopy
-import math
-import numpy as np
-
-import sys
-import os
-sys.path.append(
-    os.path.dirname(
-        os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__))
-        )
-    )
-)
+import operator
+from functools import lru_cache, reduce
+from types import MappingProxyType
 
+from dupontcontraction.rationals import to_Q
 import dupontcontraction.simplicial.sullivanforms.sullivanforms as sf
+import dupontcontraction.simplicial.sullivanforms.auxiliary_functions as af
 import dupontcontraction.simplicial.dupontforms.binary_tree_generator as btg
 
+
+def _parse_key(w):
+    """
+    List of indices of a key given as i_0|...|i_k or as a tuple of indices.
+    """
+    if isinstance(w, str):
+        return [int(i) for i in w.split('|')] if w else []
+    return [int(i) for i in w]
+
+
+@lru_cache(maxsize=8192)
+def _canonical_key(n, w):
+    """
+    Bitmask and sign of the key w (as accepted by DupontForm) in simplicial
+    dimension n. The sign is 0 for keys giving no basic form (the empty key,
+    repeated indices or degree too big). Keys recur across forms, so the index
+    arithmetic is only done once per key.
+    """
+    w_split = _parse_key(w)
+    if not w_split:
+        return 0, 0
+        
+    # check validity
+    for i in w_split:
+        if i < 0 or i > n:
+            raise TypeError('invalid form')
+        
+    # check for invalid (zero) forms
+    # notice that degree = len(w_split) - 1
+    if len(w_split) > n + 1:
+        return 0, 0
+    
+    # sort, with the sign of permutation
+    sign = af._sort_with_sign(w_split)
+    
+    mask = 0
+    if sign != 0:
+        for i in w_split:
+            mask |= 1 << i
+    return mask, sign
+
+
+@lru_cache(maxsize=None)
+def _mask_to_indices(mask):
+    """
+    Sorted tuple of indices i such that bit i of mask is set.
+    """
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return tuple(out)
+
+
+def _key_to_str(mask):
+    """
+    String i_0|...|i_k of a key given as a bitmask.
+    """
+    return '|'.join([str(i) for i in _mask_to_indices(mask)])
+
+
+@lru_cache(maxsize=None)
+def _basis_i(n, mask):
+    """
+    Image under i of the basic form \omega_w (w given as a bitmask) in
+    simplicial dimension n. Only depends on (n, mask), hence cached (and
+    shared).
+    """
+    # exponents of the constant monomial, only t_{w_k} changes below
+    zero_m = (0,) * (n + 1)
+    
+    w = _mask_to_indices(mask)
+    if not w:
+        return sf.SullivanForm(n, {(): {zero_m: 1}})
+    
+    # Sullivan form associated to w
+    aux_sf = {}
+    for k in range(len(w)):
+        sign = -1 if k & 1 else 1
+        dt = w[:k] + w[k+1:]
+        
+        p = list(zero_m)
+        p[w[k]] = 1
+        
+        aux_sf[dt] = {tuple(p): sign}
+    
+    return af._factorial(len(w) - 1) * sf.SullivanForm(n, aux_sf)
+
+
+def _subtree_product(tree, args, cache):
+    """
+    Sullivan form h(i(a) i(b)) of a non-root binary subtree [a, b], given as
+    nested tuples of indices in args. The results are stored in cache, keyed
+    by the subtree (which determines both the shape and the arguments).
+    """
+    if isinstance(tree, int):
+        return args[tree]._i_cached()
+    if tree in cache:
+        return cache[tree]
+    
+    left = _subtree_product(tree[0], args, cache)
+    right = _subtree_product(tree[1], args, cache)
+    if left.is_zero:
+        out = left
+    elif right.is_zero:
+        out = right
+    else:
+        # h vanishes in degree 0, so the multiplication skips it
+        out = left._mul(right, positive_degree=True).h()
+    
+    cache[tree] = out
+    return out
+
+
 class DupontForm:
     
+    # no instance dict; _i_cache and _hash are computed on first use
+    __slots__ = ('n', 'is_zero', 'form', '_i_cache', '_hash')
+    
     def __init__(self, n, form):
         """
         Dupont forms.
@@ -33,8 +141,12 @@ class DupontForm:
             Simplicial dimension.
         is_zero : bool
             Indicates if the form is zero or not.
-        form : dict
-            Content of the form.
+        form : mapping
+            Content of the form. The key of the basic form
+            \omega_{i_0...i_k} is the bitmask with bits i_0, ..., i_k set
+            (the indices are always taken in increasing order). It is a
+            read-only view (types.MappingProxyType): forms cannot be modified
+            once built.
 
         Parameters
         ----------
@@ -42,9 +154,10 @@ class DupontForm:
             Simplicial dimension.
         form : dict or string
             For a dict argument:
-                Keys are of the form i_0|...|i_k indicating the basic form
-                \omega_{i_0...i_k}, and the associated element is the
-                coefficient of that form (a rational number).
+                Keys are of the form i_0|...|i_k (or tuples (i_0, ..., i_k))
+                indicating the basic form \omega_{i_0...i_k}, and the
+                associated element is the coefficient of that form (a rational
+                number). The empty key stands for the constant 1.
                 Note that 1 = \omega_0 + ... + \omega_n
 
         Raises
@@ -67,6 +180,9 @@ class DupontForm:
         
         self.n = n
         self.is_zero = False
+        # image under i, computed on first use (see _i_cached)
+        self._i_cache = None
+        self._hash = None
         
         if isinstance(form, str):
             raise NotImplementedError('string argument for form is not '
@@ -75,55 +191,31 @@ class DupontForm:
         if isinstance(form, dict):
             out_form = {}
             
-            # transform 1 in the sum of the degree 0 basic forms
-            if '' in form:
-                c = fractions.Fraction(form[''])
-                for v in range(n + 1):
-                    if str(v) in form:
-                        form[str(v)] = fractions.Fraction(form[str(v)]) + c
-                    else:
-                        form[str(v)] = c
-            
-            for w in form:
-                if w == '':
+            # different keys can give the same basic form ('0|1' and '1|0',
+            # '0' and (0,)...), their coefficients are added
+            constant = 0
+            for w, c in form.items():
+                if w == '' or w == ():
+                    constant += to_Q(c)
                     continue
-                else:
-                    w_split = [int(i) for i in w.split('|')]
-                    
-                # check validity
-                for i in w_split:
-                    if i < 0 or i > n:
-                        raise TypeError('invalid form')
-                    
-                # check for invalid (zero) forms
-                # notice that degree = len(w_split) - 1
-                if len(w_split) > n + 1:
-                    continue
-                
-                # sign of permutation
-                sign = 1
-                for (i, j) in it.combinations(w_split, 2):
-                    if i == j:
-                        sign = 0
-                        break
-                    if i > j:
-                        sign *= -1
                 
+                w_out, sign = _canonical_key(n, w)
                 if sign == 0:
                     continue
-                
-                # add valid forms to out
-                w_split.sort()
-                w_out = '|'.join([str(i) for i in w_split])
-                out_form[w_out] = sign*fractions.Fraction(form[w])
-                if out_form[w_out] == 0:
-                    del out_form[w_out]
+                out_form[w_out] = out_form.get(w_out, 0) + sign*to_Q(c)
+            
+            # transform 1 in the sum of the degree 0 basic forms
+            if constant:
+                for v in range(n + 1):
+                    out_form[1 << v] = out_form.get(1 << v, 0) + constant
+            
+            out_form = {w: c for w, c in out_form.items() if c}
             
             # check for zero forms
             if not out_form:
                 self.is_zero = True
             
-            self.form = out_form
+            self.form = MappingProxyType(out_form)
         return
     
     
@@ -131,20 +223,36 @@ class DupontForm:
         """
         Check equality of Dupont forms by comparing coefficients on the basis.
         """        
-        for w, c in self.form.items():
-            if w not in other.form or c != other.form[w]:
-                return False
-        for w, c in other.form.items():
-            if w not in self.form or c != self.form[w]:
-                return False
-        return True
+        return self.n == other.n and self.form == other.form
+    
+    
+    def __hash__(self):
+        # the content is read-only, so the hash is computed once
+        if self._hash is None:
+            self._hash = hash((self.n, frozenset(self.form.items())))
+        return self._hash
     
     
     def zero(n):
         """
         Zero Dupont form of simplicial degree n.
         """
-        return DupontForm(n, {'': 0})
+        return DupontForm._from_canonical(n, {})
+    
+    
+    @staticmethod
+    def _from_canonical(n, form):
+        """
+        Wrap a dict of sorted keys with non-zero Q coefficients into a
+        Dupont form without going through the validation of __init__.
+        """
+        out = DupontForm.__new__(DupontForm)
+        out.n = n
+        out.form = MappingProxyType(form)
+        out.is_zero = not form
+        out._i_cache = None
+        out._hash = None
+        return out
         
     
     def __repr__(self):
@@ -160,41 +268,28 @@ class DupontForm:
         if self.is_zero:
             return '0'
         
-        r = ''
-        for k, w in enumerate(self.form):
-            c = self.form[w]
-            
+        parts = []
+        for k, (w, c) in enumerate(self.form.items()):
             if k > 0:
-                r += ' '
+                parts.append(' ')
             
             if c < 0:
-                r += '-'
+                parts.append('-')
                 c = -c
             elif k > 0:
-                r += '+'
+                parts.append('+')
             
             if k > 0:
-                r += ' '
+                parts.append(' ')
             
-            if c == 1:
-                if w == '':
-                    if c.denominator == 1:
-                        r += f"{c.numerator}"
-                    else:
-                        r += f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
-                else:
-                    pass
-            elif c.denominator == 1:
-                r += f"{c.numerator}"
-            else:
-                r += f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
+            # coefficient 1 is omitted, except for the constant
+            if c != 1 or not w:
+                parts.append(af._fmt_coef(c))
             
-            if w == '':
-                continue
-            else:
-                r += f"\omega_{{{w}}}"
+            if w:
+                parts.append(f"\\omega_{{{_key_to_str(w)}}}")
             
-        return r
+        return ''.join(parts)
                 
     
     def __add__(self, other):
@@ -222,13 +317,14 @@ class DupontForm:
                              ' dimension to be added together.')
         
         # case where one of the forms is zero
+        # (coefficients are immutable, shallow copies are enough)
         if self.is_zero:
-            return deepcopy(other)
+            return DupontForm._from_canonical(other.n, dict(other.form))
         if other.is_zero:
-            return deepcopy(self)
+            return DupontForm._from_canonical(self.n, dict(self.form))
         
         # actual sum
-        out_form = deepcopy(self.form)
+        out_form = dict(self.form)
         for w, c in other.form.items():
             if w in out_form:
                 out_form[w] += c
@@ -237,7 +333,7 @@ class DupontForm:
             else:
                 out_form[w] = c
         
-        return DupontForm(self.n, out_form)
+        return DupontForm._from_canonical(self.n, out_form)
     
     
     def __rmul__(self, other):
@@ -245,11 +341,13 @@ class DupontForm:
         Scalar multiplicaiton of Dupont forms.
         """
         try:
-            other = fractions.Fraction(other)
+            other = to_Q(other)
         except:
             raise TypeError('Invalid scalar multiplication.')
         
-        return DupontForm(
+        if other == 0:
+            return DupontForm.zero(self.n)
+        return DupontForm._from_canonical(
             self.n,
             {w: other*c for w, c in self.form.items()}
         )
@@ -259,7 +357,18 @@ class DupontForm:
         """
         Sum of scalar with form.
         """
-        return DupontForm(self.n, {'': other}) + self
+        try:
+            other = to_Q(other)
+        except:
+            raise TypeError('Invalid scalar addition.')
+        
+        # the constant is the sum of the degree 0 basic forms
+        if other == 0:
+            return DupontForm._from_canonical(self.n, dict(self.form))
+        return DupontForm._from_canonical(
+            self.n,
+            {1 << v: other for v in range(self.n + 1)}
+        ) + self
     
     
     def d(self):
@@ -267,46 +376,70 @@ class DupontForm:
         Differential of Dupont form.
         """
         out_n = self.n
-        out_form = DupontForm.zero(out_n)
+        out_form = {}
         for w, c in self.form.items():
+            # at most n + 1 indices
+            if af._popcount(w) > out_n:
+                continue
             for i in range(out_n + 1):
-                out_form += DupontForm(out_n, {f"{i}|{w}": c})
-        return out_form
+                bit = 1 << i
+                if w & bit:
+                    continue
+                # moving i past the smaller indices gives the sign
+                pos = af._popcount(w & (bit - 1))
+                aux_w = w | bit
+                aux_c = out_form.get(aux_w, 0) + (-c if pos & 1 else c)
+                if aux_c:
+                    out_form[aux_w] = aux_c
+                else:
+                    del out_form[aux_w]
+        return DupontForm._from_canonical(out_n, out_form)
         
         
     def i(self):
         """
         Map i of the contraction, returns a SullivanForm.
         """
+        return self._i_cached().copy()
+    
+    
+    def _i_cached(self):
+        """
+        Image under i, computed once per Dupont form (and shared).
+        """
+        if self._i_cache is None:
+            self._i_cache = self._i()
+        return self._i_cache
+    
+    
+    def _i(self):
         out_n = self.n
-        out_form = sf.SullivanForm(out_n, {})
         
+        # multiple of a single basic form (e.g. the leaves of the trees in
+        # a_infinity_product): its image is a multiple of the cached one
+        if len(self.form) == 1:
+            (w, c), = self.form.items()
+            if c == 1:
+                return _basis_i(out_n, w)
+            return c*_basis_i(out_n, w)
+        
+        out_form = {}
+        
+        # linear combination of the cached images of the basic forms
         for w, c in self.form.items():
-            if w == '':
-                aux_sf = sf.SullivanForm(
-                    out_n,
-                    {'': {'|'.join(['0' for i in range(out_n + 1)]): c}}
-                )
-            else:
-                w_split = w.split('|')
-                # Sullivan form associated to w
-                aux_sf = {}
-                for k in range(len(w_split)):
-                    sign = (-1)**k
-                    dt = '|'.join(w_split[:k] + w_split[k+1:])
-                    
-                    p = ['0' for i in range(out_n + 1)]
-                    p[int(w_split[k])] = '1'
-                    p = '|'.join(p)
-                    
-                    aux_sf[dt] = {p: sign*c}
-                
-                aux_sf = math.factorial(len(w_split) - 1) * \
-                    sf.SullivanForm(out_n, aux_sf)
-            
-            out_form += aux_sf
+            for dt, p in _basis_i(out_n, w).form.items():
+                aux_p = out_form.setdefault(dt, {})
+                for m, c_m in p.items():
+                    aux_c = aux_p.get(m, 0) + c * c_m
+                    if aux_c:
+                        aux_p[m] = aux_c
+                    else:
+                        del aux_p[m]
         
-        return out_form
+        return sf.SullivanForm._from_canonical(
+            out_n,
+            {dt: p for dt, p in out_form.items() if p}
+        )
     
     
     def tree_product(tree):
@@ -342,7 +475,8 @@ class DupontForm:
                 # any appearance of zero makes the whole thing zero
                 if sub_tree.is_zero:
                     return DupontForm.zero(sub_tree.n)
-                aux_tree.append(sub_tree.i())
+                # i is computed only once for each leaf, not once per tree
+                aux_tree.append(sub_tree._i_cached())
             # otherwise iterate
             else:
                 aux_tree.append(DupontForm._tree_product(sub_tree, root=False))
@@ -352,10 +486,15 @@ class DupontForm:
         
         # now we have just a list of Sullivan form, take the product and apply
         # h or p depending if we are at the root or not
+        # (left to right, the factors are graded and cannot be reordered)
         if root:
-            return np.product(aux_tree).p()
+            return reduce(operator.mul, aux_tree).p()
         else:
-            return np.product(aux_tree).h()
+            # h vanishes in degree 0, so the last multiplication skips it
+            product = reduce(operator.mul, aux_tree[:-1])
+            if product.is_zero:
+                return product
+            return product._mul(aux_tree[-1], positive_degree=True).h()
     
     
     def a_infinity_product(*args):
@@ -371,17 +510,33 @@ class DupontForm:
                                  'simplicial dimension.')
         
         arity = len(args)
+        if arity < 2:
+            raise TypeError('Invalid tree.')
         
-        out_form = DupontForm.zero(out_n)
-        for tree in btg.binary_tree_generator(arity):
-            sign = tree[0]
-            tree = btg.map_args(tree, args)
-            
-            form = sign*DupontForm.tree_product(tree)
+        # any zero argument kills every tree
+        if any(duf.is_zero for duf in args):
+            return DupontForm.zero(out_n)
+        
+        # the planar trees share many subtrees (same shape on the same leaves),
+        # their products are only computed once
+        cache = {}
+        
+        # the sum over all trees is accumulated in a single dict
+        out_form = {}
+        for sign, tree, arities in btg.binary_tree_list(arity):
+            left = _subtree_product(tree[0], args, cache)
+            right = _subtree_product(tree[1], args, cache)
+            if left.is_zero or right.is_zero:
+                continue
             
-            out_form += form
+            for w, c in (left*right).p().form.items():
+                aux_c = out_form.get(w, 0) + sign*c
+                if aux_c:
+                    out_form[w] = aux_c
+                else:
+                    del out_form[w]
         
-        return out_form
+        return DupontForm._from_canonical(out_n, out_form)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,96 @@
 import itertools as it
+import math
+from functools import lru_cache
+from operator import add
+from types import MappingProxyType
+
+from dupontcontraction.rationals import Q
+
+# factorials of the small integers (degrees and exponents) met in practice
+_FACTORIALS = tuple(math.factorial(k) for k in range(65))
+
+def _factorial(k):
+    """
+    Factorial of k, from the table for small k (auxiliary function).
+    """
+    if k < len(_FACTORIALS):
+        return _FACTORIALS[k]
+    return math.factorial(k)
+
+def _read_only_form(form):
+    """
+    Read-only view of a dict in the format of the forms, with read-only
+    polynomials (auxiliary function). Polynomials that are already read-only
+    (taken from another form) are shared as they are.
+    """
+    return MappingProxyType({
+        dt: p if type(p) is MappingProxyType else MappingProxyType(p)
+        for dt, p in form.items()
+    })
+
+@lru_cache(maxsize=None)
+def _simplex_integral(m, n):
+    """
+    Integral of the monomial t^m over the n-simplex (with respect to
+    dt_1...dt_n), i.e. m_0!...m_n! / (|m| + n)! (auxiliary function).
+    """
+    num = 1
+    for e in m:
+        num *= _factorial(e)
+    return Q(num, _factorial(sum(m) + n))
+
+def _fmt_coef(c):
+    """
+    LaTeX code of a non-negative rational coefficient (auxiliary function).
+    """
+    if c.denominator != 1:
+        return f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
+    return f"{c.numerator}"
+
+# number of set bits (int.bit_count only exists from Python 3.10 onwards)
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    def _popcount(mask):
+        return bin(mask).count('1')
+
+def _sort_with_sign(indices):
+    """
+    Sort a list of (non-negative) indices in place and return the sign of the
+    sorting permutation (auxiliary function).
+
+    Parameters
+    ----------
+    indices : list
+        Indices, sorted in place.
+
+    Returns
+    -------
+    sign : int
+        Sign of the permutation, 0 if there are repeated indices (in which
+        case the list is left untouched).
+
+    """
+    # bitmask of the indices seen so far: repetitions give 0, and every index
+    # is inverted with the bigger ones seen before it
+    seen = 0
+    inv = 0
+    for i in indices:
+        bit = 1 << i
+        if seen & bit:
+            return 0
+        inv += _popcount(seen >> (i + 1))
+        seen |= bit
+    
+    # the set bits of seen are the sorted indices
+    k = 0
+    while seen:
+        low = seen & -seen
+        indices[k] = low.bit_length() - 1
+        seen ^= low
+        k += 1
+    
+    return -1 if inv & 1 else 1
 
 def _add_polynomials(p1, p2):
     """
@@ -17,17 +109,77 @@ def _add_polynomials(p1, p2):
         Sum of the polynomials.
 
     """        
-    p_out = p1.copy()
-    
+    return _iadd_polynomials(p1.copy(), p2)
+
+def _iadd_polynomials(p1, p2):
+    """
+    Add the polynomial p2 to p1 in place (auxiliary function), for
+    accumulators that are not shared with any form.
+
+    Parameters
+    ----------
+    p1 : dict
+        Polynomial as in the forms, modified in place.
+    p2 : dict
+        Polynomial as in the forms.
+
+    Returns
+    -------
+    p1 : dict
+        Sum of the polynomials.
+
+    """
     for m, coeff in p2.items():
-        if m in p_out:
-            p_out[m] += coeff
-            if p_out[m] == 0:
-                del p_out[m]
+        # single dictionary lookup
+        c = p1.get(m)
+        if c is None:
+            p1[m] = coeff
         else:
-            p_out[m] = coeff
+            c += coeff
+            if c:
+                p1[m] = c
+            else:
+                del p1[m]
             
-    return p_out
+    return p1
+
+def _iadd_term(acc, dt, m, coeff):
+    """
+    Add coeff*m*dt in place to the accumulator acc, a dict in the format of
+    the forms (auxiliary function). As in the sum of forms, cancelling
+    monomials are removed, and so are polynomials cancelling out entirely.
+    """
+    p = acc.get(dt)
+    if p is None:
+        acc[dt] = {m: coeff}
+        return
+    c = p.get(m)
+    if c is None:
+        p[m] = coeff
+    else:
+        c += coeff
+        if c:
+            p[m] = c
+        else:
+            del p[m]
+            if not p:
+                del acc[dt]
+
+def _iadd_dt_polynomial(acc, dt, p):
+    """
+    Add p*dt in place to the accumulator acc, a dict in the format of the
+    forms (auxiliary function). A new dt stores p itself, so p must not be
+    shared with any form. As in the sum of forms, polynomials cancelling out
+    are removed.
+    """
+    p_acc = acc.get(dt)
+    if p_acc is None:
+        if p:
+            acc[dt] = p
+    else:
+        _iadd_polynomials(p_acc, p)
+        if not p_acc:
+            del acc[dt]
 
 def _multiply_polynomials(p1, p2):
     """
@@ -46,23 +198,38 @@ def _multiply_polynomials(p1, p2):
         Product of the polynomials.
 
     """
-    p_out = {}
+    # multiplying by a single monomial shifts the exponents injectively, so
+    # no two terms can collide (and a constant leaves them unchanged)
+    if len(p1) == 1:
+        p1, p2 = p2, p1
+    if len(p2) == 1:
+        (e2, c2), = p2.items()
+        if not any(e2):
+            # multiplication by 1
+            if c2 == 1:
+                return dict(p1)
+            return {m: c*c2 for m, c in p1.items()}
+        return {
+            tuple(map(add, e1, e2)): c1*c2
+            for e1, c1 in p1.items()
+        }
     
-    for m1, m2 in it.product(p1, p2):
-        c1, c2 = p1[m1], p2[m2]
-        
-        m_out = '|'.join(
-            [str(int(k1) + int(k2)) for k1, k2 \
-             in zip(m1.split('|'), m2.split('|'))]
-        )
+    # exponents add componentwise (map runs the loop in C)
+    p_out = {}
+    for (e1, c1), (e2, c2) in it.product(p1.items(), p2.items()):
+        m_out = tuple(map(add, e1, e2))
         
         c_out = c1*c2
         
-        if m_out in p_out:
-            p_out[m_out] += c_out
-            if p_out[m_out] == 0:
-                del p_out[m_out]
-        else:
+        # single dictionary lookup
+        c = p_out.get(m_out)
+        if c is None:
             p_out[m_out] = c_out
+        else:
+            c += c_out
+            if c:
+                p_out[m_out] = c
+            else:
+                del p_out[m_out]
     
-    return p_out
\ No newline at end of file
+    return p_out
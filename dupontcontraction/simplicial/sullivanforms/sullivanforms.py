@@ -4,28 +4,85 @@ Class for Sullivan forms.
 This class implements polynomial differential forms on the simplices.
 
 The base field is Q (the rational numbers).
+
+Sullivan forms are immutable: the content form of a Sullivan form and each of
+its polynomials are read-only views (types.MappingProxyType), set up once in
+__init__ and _from_canonical. Polynomials, and whole forms, are therefore
+shared between forms and caches without being copied.
 """
 
 import itertools as it
-import fractions
-import numpy as np
-import math
-
-import sys
-import os
-sys.path.append(
-    os.path.dirname(
-        os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__))
-        )
-    )
-)
+import bisect
+from functools import lru_cache
 
+from dupontcontraction.rationals import to_Q
 from dupontcontraction.simplicial.sullivanforms import auxiliary_functions as af
 from dupontcontraction.simplicial.dupontforms import dupontforms as duf
 
+def _parse_key(k):
+    """
+    Tuple of integers of a key given as i_0|...|i_k or as a tuple.
+    """
+    if isinstance(k, str):
+        return tuple([int(i) for i in k.split('|')]) if k else ()
+    return tuple([int(i) for i in k])
+
+
+def _key_to_str(k):
+    """
+    String i_0|...|i_k of a key given as a tuple.
+    """
+    return '|'.join([str(i) for i in k])
+
+
+@lru_cache(maxsize=8192)
+def _canonical_dt(n, key):
+    """
+    Sorted tuple and sign of the dt key i_0|...|i_k (or tuple) in simplicial
+    dimension n. The sign is 0 if the component vanishes (repeated or too many
+    dt_i). Keys recur across forms, so the sorting is only done once per key.
+    """
+    split_key = list(_parse_key(key))
+    if not split_key:  # empty key
+        return (), 1
+    
+    # check validity
+    for i in split_key:
+        if i < 0 or i > n:
+            raise TypeError('invalid form')
+    
+    # if we have too many dt_i we get zero
+    if len(split_key) > n:
+        return None, 0
+    
+    # sort, with the sign of permutation to order the dt_i
+    sign = af._sort_with_sign(split_key)
+    
+    if sign == 0:
+        return None, 0
+    return tuple(split_key), sign
+
+
+@lru_cache(maxsize=None)
+def _replacement_poly(n, eliminate):
+    """
+    The polynomial 1 - t_0 - ... - t_n (without t_[eliminate]) used by
+    reduce() in place of t_[eliminate], as a SullivanForm of degree 0. It only
+    depends on (n, eliminate), so it is built once.
+    """
+    poly = {
+        tuple([int(j == i) for j in range(n + 1)]): to_Q(-1) \
+            for i in range(n + 1) if i != eliminate
+    }
+    poly[(0,)*(n + 1)] = to_Q(1)
+    return SullivanForm._from_canonical(n, {(): poly})
+
 class SullivanForm:
     
+    # many small forms are created during contractions, no instance dict;
+    # _masks is computed on first use
+    __slots__ = ('n', 'is_zero', 'form', '_masks')
+    
     def __init__(self, n, form):
         """
         Sullivan forms.
@@ -36,8 +93,10 @@ class SullivanForm:
             Simplicial dimension.
         is_zero : bool
             Indicates if the form is zero or not.
-        form : dict
-            Content of the form.
+        form : mapping
+            Content of the form. Keys are the sorted tuples (i_0, ..., i_k)
+            of the dt_i, and for each of them the polynomial is a mapping with
+            keys the tuples of exponents (k_0, ..., k_n). Both are read-only.
 
         Parameters
         ----------
@@ -52,6 +111,7 @@ class SullivanForm:
                 of the form k_0|...|k_n where n is the dimension indicating a
                 monomial coeff*t_0^{k_0}...t_n^{k_n}, and the associated
                 element is the coefficient
+                Keys can also be given directly as tuples of integers.
 
         Raises
         ------
@@ -71,6 +131,8 @@ class SullivanForm:
         
         self.n = n
         self.is_zero = False
+        # bitmasks of the dt keys, computed on first use (see _dt_masks)
+        self._masks = None
         
         if isinstance(form, str):
             raise NotImplementedError('string argument for form is not '
@@ -80,38 +142,12 @@ class SullivanForm:
             out_form = {}
             
             # Keys denote the dt_i and need to be of the form
-            # i_0|i_1|...|i_k with i_j between 0 and n
+            # i_0|i_1|...|i_k (or tuples) with i_j between 0 and n
             # Repetitions make the form be zero
             for key in form:
-                if key:  # non-empty string
-                    split_key = [int(i) for i in key.split('|')]
-                    
-                    # check validity
-                    for i in split_key:
-                        if i < 0 or i > n:
-                            raise TypeError('invalid form')
-                    
-                    # if we have too many dt_i we get zero
-                    if len(split_key) > n:
-                        continue
-                    
-                    # sign of permutation to order the dt_i
-                    sign = 1
-                    for (x, y) in it.combinations(split_key, 2):
-                        if x == y:
-                            sign = 0
-                            break
-                        if x > y:
-                            sign *= -1
-                    
-                    if sign == 0:
-                        continue
-                    
-                    # sort
-                    split_key.sort()
-                else:  # empty string
-                    split_key = []
-                    sign = 1
+                out_key, sign = _canonical_dt(n, key)
+                if sign == 0:
+                    continue
                 
                 # Element associated to the key are again dictionaries with
                 # keys k_0|k_1|...|k_n (corresponding to the monomial
@@ -121,7 +157,7 @@ class SullivanForm:
                 out_monomials = {}
                 
                 for m in monomials:
-                    split_m = [int(k) for k in m.split('|')]
+                    split_m = _parse_key(m)
                     
                     # checks
                     if len(split_m) != n + 1:
@@ -130,30 +166,50 @@ class SullivanForm:
                         if k < 0:
                             raise TypeError('invalid form')
                     
-                    # coefficient
-                    coeff = sign*fractions.Fraction(monomials[m])
-                    if coeff == 0:
-                        continue
-                    out_monomials[m] = coeff
+                    # coefficient (different keys can give the same monomial)
+                    coeff = sign*to_Q(monomials[m])
+                    if split_m in out_monomials:
+                        coeff += out_monomials[split_m]
+                    out_monomials[split_m] = coeff
+                
+                out_monomials = {m: c for m, c in out_monomials.items() if c}
                     
-                # if non-empty list of monomials, save to output
+                # if non-empty list of monomials, save to output (different
+                # keys can give the same sorted dt)
                 if out_monomials:
-                    out_key = '|'.join([str(i) for i in split_key])
+                    if out_key in out_form:
+                        out_monomials = af._add_polynomials(
+                            out_form[out_key], out_monomials
+                        )
+                        if not out_monomials:
+                            del out_form[out_key]
+                            continue
                     out_form[out_key] = out_monomials
             
-            if out_form:
-                self.form = out_form
-            else:
-                self.is_zero = True
-                self.form = {}
+            self.form = af._read_only_form(out_form)
+            self.is_zero = not out_form
             
             return
     
+    @staticmethod
+    def _from_canonical(n, form):
+        """
+        Wrap a dict already in the internal format (sorted dt tuples, Q
+        coefficients, no zero coefficient or empty polynomial) into a Sullivan
+        form without going through the validation of __init__.
+        """
+        out = SullivanForm.__new__(SullivanForm)
+        out.n = n
+        out.form = af._read_only_form(form)
+        out.is_zero = not form
+        out._masks = None
+        return out
+    
     def zero(n):
         """
         The zero form.
         """
-        return SullivanForm(n, {})
+        return SullivanForm._from_canonical(n, {})
     
     
     def copy(self):
@@ -166,10 +222,24 @@ class SullivanForm:
             A copy of self
 
         """
-        return SullivanForm(
-            self.n,
-            {dt: {m: c for m, c in p.items()} for dt, p in self.form.items()}
-        )
+        return SullivanForm._from_canonical(self.n, self.form)
+        
+        
+    def to_dict_of_strings(self):
+        """
+        Content of the form with the keys as strings i_0|...|i_k and
+        k_0|...|k_n, as accepted by the constructor.
+
+        Returns
+        -------
+        dict
+            Form as a dict of dicts.
+
+        """
+        return {
+            _key_to_str(dt): {_key_to_str(m): c for m, c in p.items()}
+            for dt, p in self.form.items()
+        }
         
         
     def __repr__(self):
@@ -186,70 +256,66 @@ class SullivanForm:
         if self.is_zero:
             return '0'
         
-        r = ''
+        # key of the constant monomial
+        zero_m = (0,) * (self.n + 1)
+        
+        r = []
         for k, ds in enumerate(self.form):
             monomials = self.form[ds]
             n_monomials = len(monomials)
             
             # polynomial
-            p = ''
+            p = []
             for i, m in enumerate(monomials):
                 coeff = monomials[m]
                 
                 if i > 0:
-                    p += ' '
+                    p.append(' ')
                 
                 if coeff < 0:
                     c = -coeff
-                    p += '-'
+                    p.append('-')
                 elif i == 0:
                     c = coeff
                 else:
                     c = coeff
-                    p += '+'
+                    p.append('+')
                 
                 if i > 0:
-                    p += ' '
+                    p.append(' ')
                     
                 if c == 1:
-                    if m == '|'.join(['0' for j in range(self.n + 1)]) \
-                        and (ds == '' or len(monomials) > 1):
-                        
-                        p += '1'
-                    else:
-                        pass
-                        
+                    if m == zero_m and (not ds or len(monomials) > 1):
+                        p.append('1')
                 else:
-                    if c.denominator != 1:
-                        p += f"\\frac{{{c.numerator}}}{{{c.denominator}}}"
-                    else:
-                        p += f"{c.numerator}"
+                    p.append(af._fmt_coef(c))
                     
-                for j, e in enumerate(m.split('|')):
-                    if e == '1':
-                        p += f"t_{{{j}}}"
-                    elif e != '0':
-                        p += f"t_{{{j}}}^{{{e}}}"
+                for j, e in enumerate(m):
+                    if e == 1:
+                        p.append(f"t_{{{j}}}")
+                    elif e != 0:
+                        p.append(f"t_{{{j}}}^{{{e}}}")
+            p = ''.join(p)
                         
             if len(p) > 0:
                 if n_monomials > 1:
                     if k > 0:
-                        r += ' + '
-                    r += f"\\left({p}\\right)"
+                        r.append(' + ')
+                    r.append(f"\\left({p}\\right)")
                 else:
                     if k > 0 and p[0] == '-':
-                        r += f" - {p[1:]}"
+                        r.append(f" - {p[1:]}")
                     else:
                         if k > 0:
-                            r += ' + '
-                        r += f"{p}"
+                            r.append(' + ')
+                        r.append(p)
             if ds:
                 if k > 0 and len(p) == 0:
-                    r += ' + '
-                for i in ds.split('|'):
-                    r += f"dt_{{{i}}}"
+                    r.append(' + ')
+                for i in ds:
+                    r.append(f"dt_{{{i}}}")
                 
-        return r
+        return ''.join(r)
     
     def __add__(self, sf):
         """
@@ -275,24 +341,38 @@ class SullivanForm:
             raise TypeError('Sullivan forms need to have the same simplicial'
                              ' dimension to be added together.')
         
-        # case where one of the forms is zero
+        # only the polynomials present in both forms are copied (and merged)
         if self.is_zero:
-            return sf.copy()
+            return SullivanForm._from_canonical(sf.n, dict(sf.form))
         if sf.is_zero:
-            return self.copy()
+            return SullivanForm._from_canonical(self.n, dict(self.form))
         
         # actual addition
         n_out = self.n
-        form_out = self.copy().form
+        form_out = dict(self.form)
         for ds, p in sf.form.items():
-            if ds in form_out:
-                form_out[ds] = af._add_polynomials(form_out[ds], p)
-                if not form_out[ds]:  # zero polynomial
-                    del form_out[ds]
-            else:
+            p_out = form_out.get(ds)
+            if p_out is None:
                 form_out[ds] = p
+                continue
+            
+            p_out = p_out.copy()
+            for m, c in p.items():
+                c_out = p_out.get(m)
+                if c_out is None:
+                    p_out[m] = c
+                else:
+                    c_out += c
+                    if c_out:
+                        p_out[m] = c_out
+                    else:
+                        del p_out[m]
+            if p_out:
+                form_out[ds] = p_out
+            else:  # zero polynomial
+                del form_out[ds]
         
-        return SullivanForm(n_out, form_out)
+        return SullivanForm._from_canonical(n_out, form_out)
     
     
     def __neg__(self):
@@ -305,7 +385,7 @@ class SullivanForm:
             Negation.
 
         """
-        return SullivanForm(
+        return SullivanForm._from_canonical(
             self.n,
             {dt: {m: -c for m, c in p.items()} for dt, p in self.form.items()}
         )
@@ -341,36 +421,62 @@ class SullivanForm:
         
         # case where one of the forms is zero
         if self.is_zero or sf.is_zero:
-            return SullivanForm(self.n, {})
+            return SullivanForm.zero(self.n)
+        # case where one of the forms is 1
+        if sf._is_one():
+            return SullivanForm._from_canonical(self.n, dict(self.form))
+        if self._is_one():
+            return SullivanForm._from_canonical(sf.n, dict(sf.form))
         
-        # actual multiplication
+        return self._mul(sf)
+    
+    
+    def _is_one(self):
+        """
+        Check if the form is the constant 1.
+        """
+        if len(self.form) != 1:
+            return False
+        p = self.form.get(())
+        if p is None or len(p) != 1:
+            return False
+        (m, c), = p.items()
+        return c == 1 and not any(m)
+    
+    
+    def _mul(self, sf, positive_degree=False):
+        # actual multiplication; with positive_degree the degree 0 part of
+        # the product is left out (e.g. when h is applied right after, since
+        # h vanishes on it)
         n_out = self.n
         form_out = {}
+        masks2 = sf._dt_masks
+        p1s, p2s = self.form, sf.form
+        
         # pairs of dt_i combinations
-        for dt1, dt2 in it.product(self.form, sf.form):
-            dt1_split, dt2_split = dt1.split('|'), dt2.split('|')
-            if dt1 == '':
-                dt1_split = []
-            if dt2 == '':
-                dt2_split = []
-            
-            # if dt1 and dt2 have common element, we get zero
-            if not set(dt1_split).isdisjoint(dt2_split):
-                continue
-            # otherwise the resulting dt is the union of the two and the
-            # polynomial is the product of polynomials
-            dt = '|'.join(dt1_split + dt2_split)
-            p = af._multiply_polynomials(self.form[dt1], sf.form[dt2])
-            
-            if dt in form_out:
-                form_out[dt] = af._add_polynomials(form_out[dt], p)
-            else:
-                form_out[dt] = p
-            
-            if not form_out[dt]:
-                del form_out[dt]
+        for dt1, mask1 in self._dt_masks.items():
+            for dt2, mask2 in masks2.items():
+                # if dt1 and dt2 have common element, we get zero
+                if mask1 & mask2:
+                    continue
+                # too many dt_i give zero
+                if len(dt1) + len(dt2) > n_out:
+                    continue
+                if positive_degree and not (mask1 | mask2):
+                    continue
+                # otherwise the resulting dt is the (sorted) union of the two,
+                # with the sign of the shuffle ordering it, and the polynomial
+                # is the product of polynomials
+                dt, sign = _canonical_dt(n_out, dt1 + dt2)
+                p = af._multiply_polynomials(p1s[dt1], p2s[dt2])
+                if sign < 0:
+                    p = {m: -c for m, c in p.items()}
+                
+                # the products are fresh dicts: products landing on the same
+                # sorted dt are summed in place, and dropped if they cancel
+                af._iadd_dt_polynomial(form_out, dt, p)
         
-        return SullivanForm(n_out, form_out)
+        return SullivanForm._from_canonical(n_out, form_out)
     
     
     def __rmul__(self, other):
@@ -388,13 +494,34 @@ class SullivanForm:
             DESCRIPTION.
 
         """
-        return SullivanForm(
+        other = to_Q(other)
+        if other == 0:
+            return SullivanForm.zero(self.n)
+        if other == 1:
+            return SullivanForm._from_canonical(self.n, dict(self.form))
+        return SullivanForm._from_canonical(
             self.n,
             {dt: {m: other*c for m, c in p.items()} \
              for dt, p in self.form.items()}
         )
     
     
+    @property
+    def _dt_masks(self):
+        """
+        Bitmask of each dt key (bit i set iff dt_i appears).
+        """
+        if self._masks is None:
+            masks = {}
+            for dt in self.form:
+                mask = 0
+                for i in dt:
+                    mask |= 1 << i
+                masks[dt] = mask
+            self._masks = masks
+        return self._masks
+    
+    
     def pullback(self, f):
         """
         Pullback of Sullivan form of simplicial degree n by injective,
@@ -421,37 +548,31 @@ class SullivanForm:
         out_form = {}
         for dt, p in self.form.items():
             # pullback of form
-            if dt == '':
-                split_dt = []
-            else:
-                split_dt = [int(i) for i in dt.split('|')]
-                
+            if dt:
                 # zero form
-                if len(split_dt) > out_n:
+                if len(dt) > out_n:
                     continue
                 # also if we have forms not in the sub-simplex
-                if len([i for i in split_dt if i not in f]) > 0:
+                if len([i for i in dt if i not in f]) > 0:
                     continue
             
             # pullback of polynomials
             out_p = {}
             for m, c in p.items():
-                split_m = [int(i) for i in m.split('|')]
-                
                 # zero polynomial on restriction
-                if len([i for i, e in enumerate(split_m) \
+                if len([i for i, e in enumerate(m) \
                         if e > 0 and i not in f]) > 0:
                     continue
                 
-                out_m = [e for i, e in enumerate(split_m) if i in f]
-                out_m = '|'.join([str(i) for i in out_m])
+                out_m = tuple([e for i, e in enumerate(m) if i in f])
                 
                 out_p[out_m] = c
             
-            # map dt to range of f
-            out_form['|'.join([str(f[i]) for i in split_dt])] = out_p
+            # map dt to range of f (f is increasing, so the result is sorted)
+            if out_p:
+                out_form[tuple([f[i] for i in dt])] = out_p
             
-        return SullivanForm(out_n, out_form)
+        return SullivanForm._from_canonical(out_n, out_form)
             
         
         raise Exception('to be implemented')
@@ -461,22 +582,23 @@ class SullivanForm:
     
     def p(self):
         
-        # initialize output form as 0
+        # the output form is accumulated in place, as a dict of bitmask keys
+        # (see DupontForm) to coefficients
         out_n = self.n
-        out_form = duf.DupontForm(out_n, {'': 0})
+        out_form = {}
         
         # for each dt, we integrate and add the result to the output form
-        for dt, p in self.form.items():            
+        for dt, p in self.form.items():
+            # terms coming from dt, added to the output form at the end
+            aux_duf = {}
+            
             # in case there is no dt (ie: just a polynomial): evaluation at
             # the vertices
-            if dt == '':
-                aux_duf = [duf.DupontForm(out_n, {'': 0})]
+            if not dt:
                 for m, c in p.items():
-                    split_m = [int(e) for e in m.split('|')]
-                    
                     # loop through vertices of the simplex
                     n_nonzero, v_nonzero = 0, -1
-                    for v, e in enumerate(split_m):
+                    for v, e in enumerate(m):
                         if e > 0:
                             n_nonzero += 1
                             v_nonzero = v
@@ -485,27 +607,20 @@ class SullivanForm:
                     if n_nonzero > 1:
                         continue
                     elif n_nonzero == 0:
-                        aux_duf.append(
-                            duf.DupontForm(
-                                out_n,
-                                {'': c}
-                            )
-                        )
+                        # 1 = \omega_0 + ... + \omega_n
+                        vertices = range(out_n + 1)
                     else:
-                        aux_duf.append(
-                            duf.DupontForm(
-                                out_n,
-                                {str(v_nonzero): c}
-                            )
-                        )
-                        
-                aux_duf = sum(aux_duf)
-                out_form += aux_duf
+                        vertices = (v_nonzero,)
+                    
+                    for v in vertices:
+                        aux_c = aux_duf.get(1 << v, 0) + c
+                        if aux_c:
+                            aux_duf[1 << v] = aux_c
+                        else:
+                            del aux_duf[1 << v]
             # otherwise, for proper forms
             else:
-                aux_duf = [duf.DupontForm(out_n, {'': 0})]
-                
-                split_dt = [int(i) for i in dt.split('|')]
+                split_dt = dt
 
                 # we consider all the sub-simplices of dimension where dt could
                 # integrate to something
@@ -514,11 +629,19 @@ class SullivanForm:
                     if len([i for i in f if i not in split_dt]) != 1:
                         continue
                     
+                    # key of \omega_f
+                    w = 0
+                    for i in f:
+                        w |= 1 << i
+                    
                     # f as map from image to range
                     f = {j: i for i, j in enumerate(f)}
                     
                     # pullback form
-                    pbf = SullivanForm(out_n, {dt: p}).pullback(f)
+                    pbf = SullivanForm._from_canonical(
+                        out_n,
+                        {dt: p}
+                    ).pullback(f)
                     
                     # skip if pullback is zero
                     if pbf.is_zero:
@@ -527,60 +650,74 @@ class SullivanForm:
                     # integrate the polynomial
                     int_poly = 0
                     # pullback of dt
-                    pb_dt = '|'.join([str(f[i]) for i in split_dt])
-                    sign = [(-1)**i for i in range(pbf.n + 1) \
-                            if i not in [f[j] for j in split_dt]][0]
+                    pb_dt = tuple([f[i] for i in split_dt])
+                    # (-1)^i for the only i in [0,...,pbf.n] not in pb_dt
+                    missing = pbf.n*(pbf.n + 1)//2 - sum(pb_dt)
+                    sign = -1 if missing & 1 else 1
                     for m, c in pbf.form[pb_dt].items():
-                        split_m = [int(e) for e in m.split('|')]
-                        int_poly += sign * c * \
-                            np.product([math.factorial(e) for e in split_m])/ \
-                            math.factorial(sum(split_m) + pbf.n)
+                        int_poly += sign * c * af._simplex_integral(m, pbf.n)
                     
                     # add resulting form
-                    aux_duf.append(
-                        duf.DupontForm(
-                            out_n,
-                            {'|'.join([str(i) for i in f]): int_poly}
-                        )
-                    )
-                    
-                aux_duf = sum(aux_duf)
-                out_form += aux_duf            
+                    if int_poly:
+                        aux_c = aux_duf.get(w, 0) + int_poly
+                        if aux_c:
+                            aux_duf[w] = aux_c
+                        else:
+                            del aux_duf[w]
+            
+            for w, c in aux_duf.items():
+                aux_c = out_form.get(w, 0) + c
+                if aux_c:
+                    out_form[w] = aux_c
+                else:
+                    del out_form[w]
         
-        return out_form
+        return duf.DupontForm._from_canonical(out_n, out_form)
     
     def d(self):
         """
         Differential.
         """
         out_n = self.n
-        out_form = SullivanForm.zero(out_n)
+        out_form = {}
         
         for dt, p in self.form.items():
+            # for each t_i, the sorted dt of dt_i*dt and the sign to sort it,
+            # computed once per dt (repeated dt_i or too many of them give 0)
+            split_dt = list(dt)
+            if len(split_dt) + 1 > out_n:
+                continue
+            targets = {}
+            for i in range(out_n + 1):
+                if i in split_dt:
+                    continue
+                pos = bisect.bisect(split_dt, i)
+                aux_dt = tuple(split_dt[:pos] + [i] + split_dt[pos:])
+                targets[i] = (aux_dt, -1 if pos & 1 else 1)
+            
             for m, c in p.items():
                 # d(monomial)
-                split_m = [int(e) for e in m.split('|')]
-                for i, e in enumerate(split_m):
-                    if e == 0:
+                for i, e in enumerate(m):
+                    if e == 0 or i not in targets:
                         continue
                     
-                    aux_split_m = [*split_m]
-                    aux_split_m[i] -= 1
-                    
-                    aux_m = '|'.join([str(x) for x in aux_split_m])
-                    aux_c = c * e
-                    if dt == '':
-                        aux_dt = str(i)
-                    else:
-                        aux_dt = f"{i}|{dt}"
+                    aux_m = list(m)
+                    aux_m[i] -= 1
+                    aux_m = tuple(aux_m)
+                    aux_dt, sign = targets[i]
                     
                     # add term to final form
-                    out_form += SullivanForm(
-                        out_n,
-                        {aux_dt: {aux_m: aux_c}}
-                    )
+                    aux_p = out_form.setdefault(aux_dt, {})
+                    aux_c = aux_p.get(aux_m, 0) + sign * c * e
+                    if aux_c:
+                        aux_p[aux_m] = aux_c
+                    else:
+                        del aux_p[aux_m]
         
-        return out_form
+        return SullivanForm._from_canonical(
+            out_n,
+            {dt: p for dt, p in out_form.items() if p}
+        )
     
     
     def apply_permutation(self, permutation):
@@ -609,36 +746,65 @@ class SullivanForm:
             if i not in permutation:
                 permutation[i] = i
         
-        # inverse permutation
-        permutation_inv = {j: i for i, j in permutation.items()}
+        out_n = self.n
         
+        # inverse permutation, as the positions read by the permuted monomial
+        permutation_inv = {j: i for i, j in permutation.items()}
+        positions = tuple([permutation_inv[i] for i in range(out_n + 1)])
         
-        out_n = self.n
         out_form = {}
         
         for dt, p in self.form.items():
             
-            # permute dt
-            if dt == '':
-                dt_split = []
-            else:
-                dt_split = [int(i) for i in dt.split('|')]
-            aux_dt = [str(permutation[i]) for i in dt_split]
-            aux_dt = '|'.join(aux_dt)
+            # permute dt, and sort it back with the sign of the permutation
+            aux_dt, sign = _canonical_dt(
+                out_n,
+                tuple([permutation[i] for i in dt])
+            )
+            if sign == 0:
+                continue
             
             aux_p = {}
             for m, c in p.items():
                 # permute t
-                m_split = [int(e) for e in m.split('|')]
-                aux_m = [str(m_split[permutation_inv[i]]) \
-                         for i in range(out_n + 1)]
-                aux_m = '|'.join(aux_m)
+                aux_m = tuple([m[i] for i in positions])
                 
-                aux_p[aux_m] = c
+                aux_p[aux_m] = c if sign > 0 else -c
             
             out_form[aux_dt] = aux_p
         
-        return SullivanForm(out_n, out_form)
+        return SullivanForm._from_canonical(out_n, out_form)
+    
+    
+    def _swap(self, i, j):
+        """
+        Same as apply_permutation({i: j, j: i}), for the transposition (i j)
+        used by hj: it is its own inverse and only moves two coordinates.
+        """
+        if i == j:
+            return self
+        
+        out_n = self.n
+        out_form = {}
+        
+        for dt, p in self.form.items():
+            if i in dt or j in dt:
+                aux_dt, sign = _canonical_dt(
+                    out_n,
+                    tuple([j if k == i else i if k == j else k for k in dt])
+                )
+            else:
+                aux_dt, sign = dt, 1
+            
+            aux_p = {}
+            for m, c in p.items():
+                aux_m = list(m)
+                aux_m[i], aux_m[j] = m[j], m[i]
+                aux_p[tuple(aux_m)] = c if sign > 0 else -c
+            
+            out_form[aux_dt] = aux_p
+        
+        return SullivanForm._from_canonical(out_n, out_form)
     
     
     def reduce(self, eliminate=0):
@@ -659,33 +825,30 @@ class SullivanForm:
         
         out_n = self.n
         
-        # first reduce the dt
-        temp_form = SullivanForm.zero(out_n)
+        # first reduce the dt (the sums are accumulated in place)
+        temp_form = {}
         for dt, p in self.form.items():
-            if dt == '':
-                dt_split = []
-            else:
-                dt_split = [int(i) for i in dt.split('|')]
+            dt_split = list(dt)
                         
             if eliminate not in dt_split:
-                temp_form += SullivanForm(out_n, {dt: p})
+                af._iadd_dt_polynomial(temp_form, dt, dict(p))
             else:
                 i_elim = dt_split.index(eliminate)
                 
-                aux_form = {}
                 for i in range(out_n + 1):
                     if i in dt_split:  # either eliminate or already occurring
                         continue
                     
                     aux_dt = [*dt_split]
                     aux_dt[i_elim] = i
-                    aux_dt = '|'.join([str(j) for j in aux_dt])
-                    aux_form[aux_dt] = p
+                    aux_dt, sign = _canonical_dt(out_n, tuple(aux_dt))
                     
-                # notice the minus sign
-                aux_form = -SullivanForm(out_n, aux_form)
-                
-                temp_form += aux_form
+                    # notice the minus sign
+                    af._iadd_dt_polynomial(
+                        temp_form,
+                        aux_dt,
+                        {m: -sign*c for m, c in p.items()}
+                    )
         
         # then reduce the polynomials
         
@@ -694,36 +857,42 @@ class SullivanForm:
         
         # t_eliminate = 1 - t_0 - ... - t_n () only t_eliminate not appearing
         # on the right-hand side)
-        replacement_poly = {
-            '|'.join([str(int(j == i)) for j in range(out_n + 1)]): -1 \
-                for i in range(out_n + 1) if i != eliminate
-        }
-        replacement_poly['|'.join(['0']*(out_n + 1))] = 1
-        replacement_poly = SullivanForm(out_n, {'': replacement_poly})
+        replacement_poly = _replacement_poly(out_n, eliminate)
         
-        # replace occurrences of t_eliminate with the replacement polynomial
-        out_form = SullivanForm.zero(out_n)
-        for dt, p in temp_form.form.items():
+        # replace occurrences of t_eliminate with the replacement polynomial,
+        # whose powers are computed once for the whole form (as polynomials,
+        # the replacement only has a degree 0 part)
+        replacement_p = replacement_poly.form[()]
+        powers = [replacement_p]
+        out_form = {}
+        for dt, p in temp_form.items():
             for m, c in p.items():
-                m_split = [int(e) for e in m.split('|')]
-                
                 # exponent of t_eliminate
-                exponent_elim = m_split[eliminate]
+                exponent_elim = m[eliminate]
                 
                 if exponent_elim == 0:
-                    out_form += SullivanForm(out_n, {dt: {m: c}})
+                    af._iadd_term(out_form, dt, m, c)
                 else:
-                    aux_m = m_split
+                    aux_m = list(m)
                     aux_m[eliminate] = 0
-                    aux_m = '|'.join([str(i) for i in aux_m])
-                    aux_form = SullivanForm(out_n, {dt: {aux_m: c}})
+                    aux_m = tuple(aux_m)
                     
-                    for _ in range(exponent_elim):
-                        aux_form *= replacement_poly
-                        
-                    out_form += aux_form
+                    while len(powers) < exponent_elim:
+                        powers.append(
+                            af._multiply_polynomials(powers[-1], replacement_p)
+                        )
+                    
+                    # the product is a fresh dict
+                    af._iadd_dt_polynomial(
+                        out_form,
+                        dt,
+                        af._multiply_polynomials(
+                            {aux_m: c},
+                            powers[exponent_elim - 1]
+                        )
+                    )
         
-        return out_form
+        return SullivanForm._from_canonical(out_n, out_form)
     
     
     def __eq__(self, other):
@@ -735,24 +904,17 @@ class SullivanForm:
         Warning: this applies reduce() to both self and other.
         """
         
+        if self.n != other.n:
+            return False
+        # no need to reduce zero forms
+        if self.is_zero and other.is_zero:
+            return True
+        
         self = self.reduce()
         other = other.reduce()
         
-        for dt, p in self.form.items():
-            if dt not in other.form:
-                return False
-            for m, c in p.items():
-                if m not in other.form[dt] or c != other.form[dt][m]:
-                    return False
-        
-        for dt, p in other.form.items():
-            if dt not in self.form:
-                return False
-            for m, c in p.items():
-                if m not in self.form[dt] or c != self.form[dt][m]:
-                    return False
-        
-        return True
+        # both forms are canonical, dictionary equality compares coefficients
+        return self.form == other.form
     
     
     def hj(self, j):
@@ -772,9 +934,9 @@ class SullivanForm:
         
         if j != 0:
             # reduce to the case j = 0
-            out_form = self.apply_permutation({0: j, j: 0})
+            out_form = self._swap(0, j)
             out_form = out_form.hj(0)
-            return out_form.apply_permutation({0: j, j: 0})
+            return out_form._swap(0, j)
         
         # case j = 0
         out_n = self.n
@@ -783,36 +945,34 @@ class SullivanForm:
         # there is an easy formula for a form written as
         # x1^k1...xn^kn dt_c1 dt_c2 ... dt_cm with 1 < c1 < c2 < ... < cm,
         # see Lunardon, p. 12
-        out_form = SullivanForm.zero(out_n)
+        out_form = {}
         for dt, p in aux_form.form.items():
-            if dt == '':
+            if not dt:
                 # in this case we get 0 for the monomial
                 continue
             else:
-                dt_split = [int(i) for i in dt.split('|')]
+                dt_split = list(dt)
                 
+            # dt without its i-th dt_k, and whether the sign (-1)^(i-1) is
+            # negative (notice we start with c_1 and not c_0 in the formula in
+            # Lunardon), once per dt
+            faces = [
+                (k, dt[:i] + dt[i+1:], not i & 1)
+                for i, k in enumerate(dt_split)
+            ]
+            
             for m, c in p.items():
-                m_split = [int(e) for e in m.split('|')]
+                aux_c = c / (sum(m) + len(dt_split))
                 
-                aux_c = c / (sum(m_split) + len(dt_split))
-                
-                for i, k in enumerate(dt_split):
-                    aux_dt = [*dt_split]
-                    aux_dt.remove(k)
-                    aux_dt = '|'.join([str(j) for j in aux_dt])
-                    
-                    aux_m = [*m_split]
+                for k, aux_dt, negative in faces:
+                    aux_m = list(m)
                     aux_m[k] += 1
-                    aux_m = '|'.join([str(j) for j in aux_m])
+                    aux_m = tuple(aux_m)
                     
-                    # notice we start with c_1 and not c_0 in the formula in
-                    # Lunardon, so we take (-1)^(i-1) here
-                    out_form += SullivanForm(
-                        out_n,
-                        {aux_dt: {aux_m: -((-1)**i) * aux_c}}
-                    )
+                    af._iadd_term(out_form, aux_dt, aux_m,
+                                  -aux_c if negative else aux_c)
         
-        return out_form
+        return SullivanForm._from_canonical(out_n, out_form)
     
     
     def hf(self, f):
@@ -850,12 +1010,32 @@ class SullivanForm:
         -------
         SullivanForm.
         """
-        out_form = SullivanForm.zero(self.n)
+        if self.is_zero:
+            return SullivanForm.zero(self.n)
+        # the terms of all the w_f * h_f are accumulated in place
+        out_form = {}
+        # h_f = h_{f_k} ... h_{f_0}, so each h_f is obtained from the one of f
+        # without its last element (computed for the previous k)
+        hfs = {(): self}
         for k in range(1, self.n + 2):
             for f in it.combinations(range(0, self.n + 1), k):
-                wf = duf.DupontForm(self.n, {'|'.join([str(i) for i in f]): 1})
-                wf = wf.i()
+                prefix = hfs[f[:-1]]
+                if prefix.is_zero:
+                    # h_j is linear, so every f extending a vanishing prefix
+                    # vanishes as well
+                    hfs[f] = prefix
+                    continue
+                hfs[f] = prefix.hj(f[-1])
+                if hfs[f].is_zero:
+                    continue
+                
+                # cached i(\omega_f)
+                mask = 0
+                for i in f:
+                    mask |= 1 << i
+                wf = duf._basis_i(self.n, mask)
                 
-                out_form += wf * self.hf(f)
+                for dt, p in (wf * hfs[f]).form.items():
+                    af._iadd_dt_polynomial(out_form, dt, dict(p))
         
-        return out_form.reduce()
\ No newline at end of file
+        return SullivanForm._from_canonical(self.n, out_form).reduce()
\ No newline at end of file
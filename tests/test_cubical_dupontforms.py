@@ -0,0 +1,35 @@
+import itertools as it
+
+from dupontcontraction.cubical import DupontForm
+
+
+def _basis(n):
+    return [
+        DupontForm(n, {f"{'|'.join(map(str, I))},{''.join(map(str, J))}": 1})
+        for degree in range(n + 1)
+        for I in it.combinations(range(1, n + 1), degree)
+        for J in it.product((0, 1), repeat=n - degree)
+    ]
+
+
+def test_differential_of_degree_zero():
+    assert DupontForm(1, {',0': 1}).d() == DupontForm(1, {'1,': -1})
+    assert DupontForm(1, {',1': 1}).d() == DupontForm(1, {'1,': 1})
+    assert DupontForm(2, {',01': 1}).d() \
+        == DupontForm(2, {'1,1': -1, '2,0': 1})
+
+
+def test_differential_of_degree_one():
+    assert DupontForm(2, {'1,0': 1}).d() == DupontForm(2, {'1|2,': 1})
+    assert DupontForm(2, {'2,0': 1}).d() == DupontForm(2, {'1|2,': -1})
+
+
+def test_differential_commutes_with_i():
+    for n in (1, 2, 3):
+        for w in _basis(n):
+            assert w.d() == w.i().d().p()
+            assert w.d().d().is_zero
+
+
+def test_constant_is_sum_of_vertices():
+    assert DupontForm(2, {',00': 1, ',01': 1, ',10': 1, ',11': 1}).d().is_zero
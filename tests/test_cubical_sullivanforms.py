@@ -0,0 +1,69 @@
+import itertools as it
+
+import pytest
+
+from dupontcontraction.cubical import DupontForm, SullivanForm
+
+
+def _basis(n):
+    return [
+        DupontForm(n, {f"{'|'.join(map(str, I))},{''.join(map(str, J))}": 1})
+        for degree in range(n + 1)
+        for I in it.combinations(range(1, n + 1), degree)
+        for J in it.product((0, 1), repeat=n - degree)
+    ]
+
+
+def test_product_sums_colliding_terms():
+    x = SullivanForm(2, '3*dx_1 - 3*x_2*dx_1 + 3*x_1*dx_2')
+    y = SullivanForm(2, 'x_2*dx_1 + dx_1*dx_2 - 3*x_1*dx_2')
+    assert x*y == SullivanForm(2, '-9*x_1*dx_1*dx_2 + 6*x_1*x_2*dx_1*dx_2')
+
+
+def test_square_of_odd_form_vanishes():
+    x = SullivanForm(2, 'x_2*dx_1 + x_1*dx_2')
+    assert (x*x).is_zero
+
+
+def test_p_of_constant():
+    assert SullivanForm(1, '1').p() == DupontForm(1, {',0': 1, ',1': 1})
+
+
+def test_p_i_is_identity():
+    for n in (1, 2, 3):
+        for w in _basis(n):
+            assert w.i().p() == w
+
+
+_FORMS = [
+    (1, 'x_1*dx_1'),
+    (2, 'x_2*dx_2'),
+    (2, 'x_1*x_2*dx_1 + x_2^2*dx_2'),
+    (3, 'x_1*x_2^2*x_3*dx_1*dx_2'),
+    (3, '3*x_1^2*x_3 - dx_3'),
+    (3, 'x_2*dx_1 + 1/2*x_1*x_3*dx_2*dx_3'),
+    (3, 'x_1^3*x_2*dx_1*dx_2*dx_3'),
+    (3, '1'),
+]
+
+
+@pytest.mark.parametrize('symmetric', [False, True])
+@pytest.mark.parametrize('n, f', _FORMS)
+def test_homotopy_identity(n, f, symmetric):
+    x = SullivanForm(n, f)
+    assert x.d().h(symmetric=symmetric) + x.h(symmetric=symmetric).d() \
+        == x - x.p().i()
+
+
+@pytest.mark.parametrize('symmetric', [False, True])
+@pytest.mark.parametrize('n, f', _FORMS)
+def test_side_conditions(n, f, symmetric):
+    x = SullivanForm(n, f)
+    assert x.h(symmetric=symmetric).h(symmetric=symmetric).is_zero
+    assert x.h(symmetric=symmetric).p().is_zero
+    assert x.p().i().h(symmetric=symmetric).is_zero
+
+
+@pytest.mark.parametrize('n, f', _FORMS)
+def test_d_squared(n, f):
+    assert SullivanForm(n, f).d().d().is_zero
@@ -0,0 +1,61 @@
+import itertools as it
+
+from dupontcontraction.cubical.signed_ordered_set import (
+    SignedOrderedSet, sort_and_sign
+)
+
+
+def _added_one_by_one(a, b):
+    # reference for __add__: insert the elements of b one at a time
+    out = SignedOrderedSet(a)
+    for el in SignedOrderedSet(b):
+        out.add_el(el)
+    return out
+
+
+def test_add_el_sign():
+    s = SignedOrderedSet([2, 0, 1])
+    assert list(s) == [0, 1, 2]
+    assert s.sign() == 1
+    assert s.sign() == 1  # reset after reading
+    s = SignedOrderedSet([1, 0, 2])
+    assert s.sign() == -1
+    s = SignedOrderedSet([1, 0, 1])
+    assert s.sign() == 0
+
+
+def test_sorted_unique():
+    s = SignedOrderedSet([0, 2, 5], sorted_unique=True)
+    assert list(s) == [0, 2, 5]
+    assert s.start == 0 and s.end == 5
+    assert s.sign() == 1
+    assert 2 in s and 3 not in s
+    assert list(SignedOrderedSet([], sorted_unique=True)) == []
+
+
+def test_add_merges_with_inversions():
+    elements = range(5)
+    for k in range(4):
+        for a in it.permutations(elements, k):
+            for l in range(4):
+                for b in it.combinations(elements, l):
+                    expected = _added_one_by_one(a, b)
+                    out = SignedOrderedSet(a) + SignedOrderedSet(b)
+                    assert list(out) == list(expected)
+                    assert out.sign() == expected.sign()
+
+
+def test_add_iterable():
+    out = SignedOrderedSet([2, 0]) + [1]
+    assert list(out) == [0, 1, 2]
+    assert out.sign() == 1
+
+
+def test_sort_and_sign():
+    for k in range(5):
+        for seq in it.permutations(range(4), k):
+            out, sign = sort_and_sign(seq)
+            s = SignedOrderedSet(seq)
+            assert out == list(s)
+            assert sign == s.sign()
+    assert sort_and_sign([1, 0, 1]) == ([0, 1], 0)
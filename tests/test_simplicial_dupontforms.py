@@ -0,0 +1,73 @@
+from dupontcontraction.simplicial import DupontForm
+
+
+def test_mixed_string_and_tuple_keys_are_summed():
+    assert DupontForm(2, {'0': 1, (0,): 1}) == DupontForm(2, {'0': 2})
+    assert DupontForm(2, {'0|2': 1, (2, 0): 3}) == DupontForm(2, {'0|2': -2})
+
+
+def test_constant_is_added_to_degree_0_keys():
+    assert DupontForm(2, {(): 1, (0,): 1}) \
+        == DupontForm(2, {'0': 2, '1': 1, '2': 1})
+    assert DupontForm(2, {'': 1, (): 2}) \
+        == DupontForm(2, {'0': 3, '1': 3, '2': 3})
+    assert DupontForm(1, {'': 1, '0': -1}) == DupontForm(1, {'1': 1})
+
+
+def test_permuted_duplicate_keys_are_summed():
+    assert DupontForm(2, {'0|1': 1, '1|0': 1}).is_zero
+    assert DupontForm(2, {'1|0': '1/2', '0|1': 3, '1|1': 5}) \
+        == DupontForm(2, {'0|1': '5/2'})
+
+
+def test_representation():
+    assert repr(DupontForm(2, {'0|1': 1, '1': '-1/2'})) \
+        == '\\omega_{0|1} - \\frac{1}{2}\\omega_{1}'
+    assert repr(DupontForm.zero(2)) == '0'
+
+
+def test_differential():
+    assert DupontForm(2, {'0': 1}).d() == DupontForm(2, {'0|1': -1, '0|2': -1})
+    assert DupontForm(2, {'0|1': 1}).d() == DupontForm(2, {'0|1|2': 1})
+    assert DupontForm(1, {'1': 1}).d() == DupontForm(1, {'0|1': 1})
+
+
+def test_i():
+    assert repr(DupontForm(2, {'0|1': 1}).i()) == 't_{0}dt_{1} - t_{1}dt_{0}'
+    assert repr(DupontForm(2, {'0': 1}).i()) == 't_{0}'
+
+
+def test_contraction_identities_on_basis():
+    basis = [
+        DupontForm(2, {w: 1})
+        for w in ('0', '1', '2', '0|1', '0|2', '1|2', '0|1|2')
+    ]
+    for w in basis:
+        assert w.i().p() == w
+        assert w.d().d().is_zero
+        assert w.d().i() == w.i().d()
+
+
+def test_equality_and_hash():
+    w01 = DupontForm(2, {'0|1': 1})
+    assert w01 == DupontForm(2, {(1, 0): -1})
+    assert hash(w01) == hash(DupontForm(2, {(1, 0): -1}))
+    assert w01 != DupontForm(2, {'1|2': 1})
+    assert w01 != DupontForm(3, {'0|1': 1})
+
+
+def test_tree_product():
+    w0 = DupontForm(2, {'0': 1})
+    w1 = DupontForm(2, {'1': 1})
+    w01 = DupontForm(2, {'0|1': 1})
+    assert DupontForm.tree_product([w0, w0]) == w0
+    assert DupontForm.tree_product([w0, w1]).is_zero
+    assert DupontForm.tree_product([w0, w01]) == DupontForm(2, {'0|1': '1/2'})
+    assert DupontForm.tree_product([[w01, w01], w1]).is_zero
+
+
+def test_a_infinity_product():
+    w1 = DupontForm(2, {'1': 1})
+    w01 = DupontForm(2, {'0|1': 1})
+    assert DupontForm.a_infinity_product(w01, w01, w1) \
+        == DupontForm(2, {'0|1': '-1/12'})
@@ -0,0 +1,45 @@
+import pytest
+
+from dupontcontraction.simplicial import DupontForm, SullivanForm
+
+
+def test_square_of_odd_form_vanishes():
+    x = DupontForm(2, {'0|1': 1}).i()
+    assert (x*x).is_zero
+    
+    y = SullivanForm(2, {'0': {'1|0|0': 1}, '1': {'0|0|1': 2}})
+    assert (y*y).is_zero
+
+
+def test_product_is_graded_commutative():
+    x = SullivanForm(2, {'0': {'1|0|0': 1}, '1': {'0|1|0': 3}})
+    y = SullivanForm(2, {'0': {'0|0|1': 2}, '1': {'0|0|0': 1}})
+    assert x*y == -(y*x)
+
+
+def test_tree_product_of_equal_odd_forms_vanishes():
+    w01 = DupontForm(2, {'0|1': 1})
+    assert DupontForm.tree_product([w01, w01]).is_zero
+
+
+def test_keys_sorting_onto_the_same_dt_are_summed():
+    x = SullivanForm(2, {'1|2': {'0|0|0': 1}, '2|1': {'0|0|0': 1}})
+    assert x.is_zero
+    
+    y = SullivanForm(2, {'1|2': {'1|0|0': 1}, '2|1': {'1|0|0': -2}})
+    assert y == SullivanForm(2, {'1|2': {'1|0|0': 3}})
+
+
+def test_keys_giving_the_same_monomial_are_summed():
+    x = SullivanForm(2, {'0': {'1|0|0': 1, (1, 0, 0): 2}})
+    assert x == SullivanForm(2, {'0': {'1|0|0': 3}})
+
+
+def test_forms_are_read_only():
+    x = SullivanForm(2, {'0': {'1|0|0': 1}})
+    y = x.copy()
+    with pytest.raises(TypeError):
+        y.form[(1,)] = {(0, 0, 0): 1}
+    with pytest.raises(TypeError):
+        y.form[(0,)][(1, 0, 0)] = 2
+    assert x == SullivanForm(2, {'0': {'1|0|0': 1}})